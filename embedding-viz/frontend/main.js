@@ -1,18 +1,41 @@
 import { renderTopography } from './topography.js';
+import { TileSource } from './tiles.js';
 import { getMode } from './utils.js';
 import './style.css';
 
 let currentData = null;
 let currentMode = 'image';
 
+// Tiled output: draw from the root tile, then fetch finer tiles for whatever is in view.
+async function loadTiledData(mode) {
+  const source = new TileSource(`/data/tiles_${mode === 'text' ? 'text' : 'image'}`);
+  const index = await source.load();
+  if (!index) return null;
+  const root = await source.fetchTile('0/0/0');
+  if (!root) return null;
+  return {
+    items: root.items,
+    clusters: index.clusters,
+    bounds: index.bounds,
+    mode,
+    tiles: source,
+  };
+}
+
 async function loadData(mode) {
+  const tiled = await loadTiledData(mode);
+  if (tiled) {
+    tiled.contours = await loadContours(mode);
+    return tiled;
+  }
   const filename = mode === 'text' ? 'embeddings_text.json' : 'embeddings_image.json';
   try {
     const response = await fetch(`/data/${filename}`);
     if (!response.ok) {
       throw new Error(`Failed to load ${filename}`);
     }
-    const data = await response.json();
+    const [data, contours] = await Promise.all([response.json(), loadContours(mode)]);
+    data.contours = contours;
     return data;
   } catch (error) {
     console.error('Error loading data:', error);
@@ -28,6 +51,16 @@ async function loadData(mode) {
   }
 }
 
+// Precomputed density contours written next to the embeddings by cluster.py (optional).
+async function loadContours(mode) {
+  try {
+    const response = await fetch(`/data/contours_${mode === 'text' ? 'text' : 'image'}.json`);
+    return response.ok ? await response.json() : null;
+  } catch (error) {
+    return null;
+  }
+}
+
 function renderVisualization(data, mode) {
   const container = document.getElementById('topography');
   if (!container) {
@@ -43,7 +76,18 @@ function renderVisualization(data, mode) {
   // Ensure mode is set
   data.mode = mode || data.mode || 'image';
   
-  renderTopography(data, container);
+  renderTopography(data, container, data.tiles ? { onViewChange: loadTilesForView(data) } : {});
+}
+
+// Swap the point layer to the items of the tiles in view (stale responses are dropped).
+function loadTilesForView(data) {
+  let request = 0;
+  return async (bounds, relativeZoom, view) => {
+    const current = ++request;
+    const items = await data.tiles.itemsForView(bounds, relativeZoom);
+    if (data !== currentData || current !== request) return;
+    view.setItems(items);
+  };
 }
 
 function handleResize() {
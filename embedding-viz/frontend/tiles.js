@@ -0,0 +1,90 @@
+// Lazy quadtree tiles written by pipeline/tiles.py (data/tiles_{mode}/).
+// The index lists every tile as "z/x/y" -> [count, isLeaf]; inner tiles carry a
+// representative sample, leaves carry all their items. Only the root tile and the tiles of the
+// current view stay cached, so memory follows the viewport rather than the browsing history.
+
+const ROOT_KEY = '0/0/0';
+
+export class TileSource {
+  constructor(baseUrl) {
+    this.baseUrl = baseUrl;
+    this.index = null;
+    this.cache = new Map();
+  }
+
+  async load() {
+    try {
+      const response = await fetch(`${this.baseUrl}/index.json`);
+      if (!response.ok) return null;
+      this.index = await response.json();
+      return this.index;
+    } catch (error) {
+      return null;
+    }
+  }
+
+  fetchTile(key) {
+    if (!this.cache.has(key)) {
+      this.cache.set(key, fetch(`${this.baseUrl}/${key}.json`)
+        .then(r => (r.ok ? r.json() : null))
+        .catch(() => null));
+    }
+    return this.cache.get(key);
+  }
+
+  // Tiles covering data-space bounds [x0, y0, x1, y1]: one level deeper per doubling of zoom
+  // (relative to the fit-to-view zoom), or a leaf if the quadtree stops earlier.
+  keysForView(bounds, relativeZoom) {
+    const { extent, tiles } = this.index;
+    const maxZoom = this.index.max_zoom;
+    const target = Math.max(0, Math.min(maxZoom, Math.floor(Math.log2(Math.max(1, relativeZoom))) + 1));
+    const [ex0, ey0, ex1, ey1] = extent;
+    const keys = [];
+    const visit = (z, x, y) => {
+      const key = `${z}/${x}/${y}`;
+      const entry = tiles[key];
+      if (!entry) return;
+      const n = 2 ** z;
+      const tx0 = ex0 + (x / n) * (ex1 - ex0);
+      const tx1 = ex0 + ((x + 1) / n) * (ex1 - ex0);
+      const ty0 = ey0 + (y / n) * (ey1 - ey0);
+      const ty1 = ey0 + ((y + 1) / n) * (ey1 - ey0);
+      if (tx1 < bounds[0] || tx0 > bounds[2] || ty1 < bounds[1] || ty0 > bounds[3]) return;
+      if (entry[1] || z >= target) {
+        keys.push(key);
+        return;
+      }
+      visit(z + 1, 2 * x, 2 * y);
+      visit(z + 1, 2 * x + 1, 2 * y);
+      visit(z + 1, 2 * x, 2 * y + 1);
+      visit(z + 1, 2 * x + 1, 2 * y + 1);
+    };
+    visit(0, 0, 0);
+    return keys;
+  }
+
+  // Drop cached tiles outside `keys` (the root is always kept).
+  retain(keys) {
+    for (const key of this.cache.keys()) {
+      if (key !== ROOT_KEY && !keys.has(key)) this.cache.delete(key);
+    }
+  }
+
+  // Root sample plus the items of the tiles in view, deduplicated (samples nest across levels).
+  async itemsForView(bounds, relativeZoom) {
+    const keys = this.keysForView(bounds, relativeZoom);
+    this.retain(new Set(keys));
+    const tiles = await Promise.all([ROOT_KEY, ...keys].map(key => this.fetchTile(key)));
+    const seen = new Set();
+    const items = [];
+    for (const tile of tiles) {
+      if (!tile) continue;
+      for (const item of tile.items) {
+        if (seen.has(item.content)) continue;
+        seen.add(item.content);
+        items.push(item);
+      }
+    }
+    return items;
+  }
+}
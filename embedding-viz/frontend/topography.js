@@ -234,7 +234,45 @@ function pickLabelForZoom(d, zoomK, { isIndicator = false } = {}) {
   return truncateLabel((raw || '').toUpperCase(), max);
 }
 
-export function renderTopography(data, container) {
+// Precomputed contour levels (coarse -> fine) switch at these zoom factors.
+const CONTOUR_LEVEL_ZOOMS = [2, 5];
+
+function contourLevelForZoom(zoomK) {
+  let level = 0;
+  for (const z of CONTOUR_LEVEL_ZOOMS) {
+    if (zoomK >= z) level += 1;
+  }
+  return level;
+}
+
+// Pipeline contour geometry ({extent, quant, levels: [{contours: [{value, rings}]}]}) -> one
+// SVG path per (level, threshold). Rings are flat quantized [x0, y0, x1, y1, ...] arrays;
+// nested rings render as holes via fill-rule evenodd.
+function contourGeometryToPaths(geometry, xScale, yScale) {
+  const [x0, y0, x1, y1] = geometry.extent;
+  const sx = (x1 - x0) / geometry.quant;
+  const sy = (y1 - y0) / geometry.quant;
+  const maxLevel = geometry.levels.length - 1;
+  const out = [];
+  geometry.levels.forEach((level, levelIndex) => {
+    for (const contour of level.contours) {
+      if (!contour.rings.length) continue;
+      let path = '';
+      for (const ring of contour.rings) {
+        for (let i = 0; i < ring.length; i += 2) {
+          const px = xScale(x0 + ring[i] * sx);
+          const py = yScale(y0 + ring[i + 1] * sy);
+          path += `${i ? 'L' : 'M'}${px.toFixed(1)},${py.toFixed(1)}`;
+        }
+        path += 'Z';
+      }
+      out.push({ value: contour.value, level: levelIndex, maxLevel, path });
+    }
+  });
+  return out;
+}
+
+export function renderTopography(data, container, { onViewChange = null } = {}) {
   const rect = container.getBoundingClientRect();
   const width = Math.max(0, rect.width || window.innerWidth);
   const height = Math.max(0, rect.height || window.innerHeight);
@@ -377,9 +415,10 @@ export function renderTopography(data, container) {
   }
   
   // Scales
+  // Tiled data only holds a subset of items, so take the full-map bounds from the tile index.
   const points = data.items.map(d => d.umap);
-  const xExtent = d3.extent(points, p => p[0]);
-  const yExtent = d3.extent(points, p => p[1]);
+  const xExtent = data.bounds ? [data.bounds[0], data.bounds[2]] : d3.extent(points, p => p[0]);
+  const yExtent = data.bounds ? [data.bounds[1], data.bounds[3]] : d3.extent(points, p => p[1]);
   const xPad = (xExtent[1] - xExtent[0]) * 0.08;
   const yPad = (yExtent[1] - yExtent[0]) * 0.08;
   
@@ -391,14 +430,18 @@ export function renderTopography(data, container) {
     .domain([yExtent[0] - yPad, yExtent[1] + yPad])
     .range([height - margin.bottom, margin.top]);
   
-  // Contours
-  const densityData = d3.contourDensity()
-    .x(d => xScale(d.umap[0]))
-    .y(d => yScale(d.umap[1]))
-    .size([width, height])
-    .bandwidth(22)
-    .thresholds(14)
-    (data.items);
+  // Contours: precomputed geometry from the pipeline when available (cost scales with the grid,
+  // not N); otherwise fall back to estimating density in the browser.
+  const densityData = data.contours
+    ? contourGeometryToPaths(data.contours, xScale, yScale)
+    : d3.contourDensity()
+      .x(d => xScale(d.umap[0]))
+      .y(d => yScale(d.umap[1]))
+      .size([width, height])
+      .bandwidth(22)
+      .thresholds(14)
+      (data.items);
+  const contourPathFor = data.contours ? (d => d.path) : d3.geoPath();
   
   const colorScale = d3.scaleSequential()
     .domain([0, d3.max(densityData, d => d.value)])
@@ -408,7 +451,8 @@ export function renderTopography(data, container) {
     .data(densityData)
     .join('path')
     .attr('class', 'contour-path')
-    .attr('d', d3.geoPath())
+    .attr('d', contourPathFor)
+    .attr('fill-rule', 'evenodd')
     .attr('stroke', d => colorScale(d.value))
     .attr('stroke-opacity', 0.6)
     .attr('fill', d => colorScale(d.value))
@@ -422,24 +466,26 @@ export function renderTopography(data, container) {
     return clusterLabelById.get(item.cluster) || `Cluster ${item.cluster}`;
   };
 
-  const dataNodes = nodesGroup.selectAll('circle')
-    .data(data.items)
-    .join('circle')
-    .attr('class', 'data-point')
+  // Keyed join so tile updates only add/remove the circles that changed.
+  const joinNodes = (items) => nodesGroup.selectAll('circle')
+    .data(items, d => d.content)
+    .join(enter => enter.append('circle')
+      .attr('class', 'data-point')
+      .attr('r', 12)
+      .attr('fill-opacity', 0.4)
+      .on('mouseenter', (event, d) => {
+        showItemTooltip(event, d, getClusterLabelFast(d));
+      })
+      .on('mousemove', updateTooltipPosition)
+      .on('mouseleave', hideTooltip)
+      .on('click', (event, d) => {
+        event.stopPropagation();
+        showLightbox(d, getClusterLabelFast(d));
+      }))
     .attr('cx', d => xScale(d.umap[0]))
     .attr('cy', d => yScale(d.umap[1]))
-    .attr('r', 12)
-    .attr('fill', d => d.cluster === -1 ? '#475569' : d3.schemeTableau10[d.cluster % 10])
-    .attr('fill-opacity', 0.4)
-    .on('mouseenter', (event, d) => {
-      showItemTooltip(event, d, getClusterLabelFast(d));
-    })
-    .on('mousemove', updateTooltipPosition)
-    .on('mouseleave', hideTooltip)
-    .on('click', (event, d) => {
-      event.stopPropagation();
-      showLightbox(d, getClusterLabelFast(d));
-    });
+    .attr('fill', d => d.cluster === -1 ? '#475569' : d3.schemeTableau10[d.cluster % 10]);
+  let dataNodes = joinNodes(data.items);
   
   // Labels with collision detection (Google Maps style)
   const itemsByClusterId = new Map();
@@ -517,7 +563,7 @@ export function renderTopography(data, container) {
   }
 
   // Cards: cache base positions + quadtree once per render (scale depends on width/height).
-  const cardCache = buildCardCache(data, mode, xScale, yScale);
+  let cardCache = buildCardCache(data, mode, xScale, yScale);
 
   // Render: at most once per frame (latest transform wins).
   const renderFrame = rafThrottle((k, transform, isZooming) => {
@@ -587,7 +633,30 @@ export function renderTopography(data, container) {
       lastZoomK = latestTransform.k;
       container._savedZoomTransform = latestTransform;
       renderFrame(latestTransform.k, latestTransform, false);
+      notifyViewChange(latestTransform);
     });
+
+  // Handle for lazily loaded tiles: replace the point set without rebuilding the map.
+  const view = {
+    setItems(items) {
+      if (container._view !== view) return; // superseded by a later render (resize, mode switch)
+      data.items = items;
+      dataNodes = joinNodes(items);
+      cardCache = buildCardCache(data, mode, xScale, yScale);
+      renderFrame(lastZoomK, latestTransform, false);
+    },
+  };
+  container._view = view;
+
+  // Data-space bounds of the viewport, for lazily loading tiles.
+  function notifyViewChange(t) {
+    if (!onViewChange) return;
+    const xa = xScale.invert((0 - t.x) / t.k);
+    const xb = xScale.invert((width - t.x) / t.k);
+    const ya = yScale.invert((0 - t.y) / t.k);
+    const yb = yScale.invert((height - t.y) / t.k);
+    onViewChange([Math.min(xa, xb), Math.min(ya, yb), Math.max(xa, xb), Math.max(ya, yb)], t.k / minZoom, view);
+  }
   
   // Preserve zoom across re-renders (e.g. resize), and avoid the "limits changed" feel.
   const initialTransform = container._savedZoomTransform
@@ -601,6 +670,7 @@ export function renderTopography(data, container) {
   // Set initial transform on the zoom behavior so wheel/pinch uses the same baseline.
   svg.call(zoom.transform, initialTransform);
   renderFrame(initialTransform.k, initialTransform, false);
+  notifyViewChange(initialTransform);
 }
 
 function updateViz(
@@ -670,9 +740,11 @@ function updateViz(
     regionIndicatorWrap.attr('opacity', 0);
   }
   
-  // Contour lines - thinner and fade as zoom increases
+  // Contour lines - thinner and fade as zoom increases; precomputed levels get finer with zoom
   const contourOpacity = Math.max(0.1, 0.6 - (zoom - 1) * 0.08);
+  const contourLevel = contourLevelForZoom(zoom);
   contourPaths
+    .attr('display', d => (d.level === undefined || d.level === Math.min(contourLevel, d.maxLevel) ? null : 'none'))
     .attr('stroke-width', 2 / Math.pow(zoom, 1.5))
     .attr('stroke-opacity', contourOpacity)
     .attr('fill-opacity', contourOpacity * 0.07);
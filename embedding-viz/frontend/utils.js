@@ -115,6 +115,18 @@ export function getImageUrl(content) {
   return '';
 }
 
+// Full note text ships in a side file (text_{mode}.json), fetched once on first open.
+const fullTextByMode = new Map();
+
+function loadFullText(mode) {
+  if (!fullTextByMode.has(mode)) {
+    fullTextByMode.set(mode, fetch(`/data/text_${mode}.json`)
+      .then(r => (r.ok ? r.json() : {}))
+      .catch(() => ({})));
+  }
+  return fullTextByMode.get(mode);
+}
+
 export function showLightbox(item, clusterLabel) {
   if (!lightbox) return;
   
@@ -127,6 +139,15 @@ export function showLightbox(item, clusterLabel) {
       lightboxText.style.display = 'block';
       const text = item.full_text || item.preview || item.id || '';
       lightboxText.textContent = text;
+      lightboxText.dataset.content = item.content || '';
+      if (!item.full_text && item.content) {
+        loadFullText(mode).then(fullText => {
+          // Ignore late responses if another item was opened meanwhile.
+          if (fullText[item.content] && lightboxText.dataset.content === item.content) {
+            lightboxText.textContent = fullText[item.content];
+          }
+        });
+      }
     }
   } else {
     if (lightboxText) lightboxText.style.display = 'none';
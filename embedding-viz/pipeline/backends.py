@@ -0,0 +1,111 @@
+"""
+CPU inference backends for the CLIP image encoder and the MiniLM text encoder.
+
+- torch: fp32 PyTorch (default; the only option on MPS/CUDA)
+- int8:  dynamic int8 quantization of every nn.Linear (CPU)
+- onnx:  ONNX Runtime graph with a fixed intra-op thread count (CPU)
+"""
+from pathlib import Path
+import torch
+
+BACKENDS = ("torch", "int8", "onnx")
+ONNX_DIR = Path(__file__).parent.parent / "data" / "cache" / "onnx"
+
+
+def backend_cache_params(backend: str) -> dict:
+    """Cache-key params; fp32 torch adds none so existing caches stay valid."""
+    return {} if backend == "torch" else {"backend": backend}
+
+
+def set_threads(threads: int = None):
+    if threads:
+        torch.set_num_threads(threads)
+
+
+def quantize_int8(model: torch.nn.Module) -> torch.nn.Module:
+    """Dynamic int8 quantization: weights stored int8, activations quantized on the fly."""
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def onnx_session_options(threads: int = None):
+    import onnxruntime as ort
+    opts = ort.SessionOptions()
+    opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    if threads:
+        opts.intra_op_num_threads = threads
+        opts.inter_op_num_threads = 1
+    return opts
+
+
+class _ClipImageTower(torch.nn.Module):
+    """Export wrapper: pixel_values -> image features."""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, pixel_values):
+        return self.model.get_image_features(pixel_values=pixel_values)
+
+
+class OnnxClipImageEncoder:
+    """Runs the exported CLIP image tower; exposes get_image_features like CLIPModel."""
+
+    def __init__(self, onnx_path: Path, threads: int = None):
+        import onnxruntime as ort
+        self.session = ort.InferenceSession(
+            str(onnx_path), onnx_session_options(threads), providers=["CPUExecutionProvider"]
+        )
+
+    def get_image_features(self, pixel_values, **_):
+        out = self.session.run(None, {"pixel_values": pixel_values.cpu().numpy()})[0]
+        return torch.from_numpy(out)
+
+    def eval(self):
+        return self
+
+
+def export_clip_image_onnx(model, model_id: str, image_size: int = 224) -> Path:
+    """Export the CLIP image tower once per model id; later runs reuse the file."""
+    onnx_path = ONNX_DIR / f"{model_id.replace('/', '__')}_image.onnx"
+    if onnx_path.exists():
+        return onnx_path
+    ONNX_DIR.mkdir(parents=True, exist_ok=True)
+    print(f"Exporting CLIP image encoder to {onnx_path}...")
+    dummy = torch.zeros(1, 3, image_size, image_size)
+    torch.onnx.export(
+        _ClipImageTower(model.cpu().eval()),
+        (dummy,),
+        str(onnx_path),
+        input_names=["pixel_values"],
+        output_names=["image_embeds"],
+        dynamic_axes={"pixel_values": {0: "batch"}, "image_embeds": {0: "batch"}},
+        opset_version=17,
+    )
+    return onnx_path
+
+
+def apply_clip_backend(model, model_id: str, backend: str = "torch", threads: int = None):
+    """Convert a loaded CLIPModel for the chosen backend (int8/onnx run on CPU)."""
+    set_threads(threads)
+    if backend == "int8":
+        return quantize_int8(model.cpu().eval())
+    if backend == "onnx":
+        return OnnxClipImageEncoder(export_clip_image_onnx(model, model_id), threads)
+    return model
+
+
+def load_text_backend(model_id: str, device: str, backend: str = "torch", threads: int = None):
+    """Load a SentenceTransformer for the chosen backend (int8/onnx run on CPU)."""
+    from sentence_transformers import SentenceTransformer
+    set_threads(threads)
+    if backend == "onnx":
+        return SentenceTransformer(
+            model_id,
+            device="cpu",
+            backend="onnx",
+            model_kwargs={"provider": "CPUExecutionProvider", "session_options": onnx_session_options(threads)},
+        )
+    if backend == "int8":
+        return quantize_int8(SentenceTransformer(model_id, device="cpu"))
+    return SentenceTransformer(model_id, device=device)
@@ -0,0 +1,98 @@
+"""
+Benchmark CPU encoder backends against the fp32 PyTorch baseline on a fixed sample.
+Reports throughput and mean cosine drift (1 - cos) per backend.
+
+    uv run python bench_backends.py --mode image --input /path/to/images --sample 256 --threads 8
+"""
+import argparse
+import copy
+import random
+import time
+from pathlib import Path
+import numpy as np
+import torch
+from backends import BACKENDS, apply_clip_backend, load_text_backend, set_threads
+from embed import (BATCH_SIZE, CLIP_MODEL_ID, IMAGE_EXTENSIONS, TEXT_EXTENSIONS, TEXT_MAX_CHARS,
+                   TEXT_MODEL_ID, load_image_batch, read_text_head)
+from scan import scan_files
+
+
+def sample_files(source_dir: str, extensions: set[str], n: int) -> list[Path]:
+    files = [f.path for f in scan_files(Path(source_dir), extensions)]
+    random.Random(0).shuffle(files)
+    return files[:n]
+
+
+def normalize(x: np.ndarray) -> np.ndarray:
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+
+def bench_images(files: list[Path], backends: list[str], threads: int = None) -> dict:
+    from transformers import CLIPModel, CLIPProcessor
+    processor = CLIPProcessor.from_pretrained(CLIP_MODEL_ID)
+    base = CLIPModel.from_pretrained(CLIP_MODEL_ID).eval()
+    set_threads(threads)
+
+    # Preprocess once so only inference is timed.
+    batches = []
+    for i in range(0, len(files), BATCH_SIZE):
+        _, inputs = load_image_batch(processor, files[i:i + BATCH_SIZE])
+        if inputs is not None:
+            batches.append(inputs["pixel_values"])
+
+    def run(model):
+        start = time.perf_counter()
+        with torch.no_grad():
+            out = [model.get_image_features(pixel_values=b).cpu().numpy() for b in batches]
+        return normalize(np.concatenate(out)), time.perf_counter() - start
+
+    results = {}
+    for backend in backends:
+        model = apply_clip_backend(copy.deepcopy(base), CLIP_MODEL_ID, backend, threads)
+        run(model)  # warm-up (graph optimization, allocator)
+        results[backend] = run(model)
+    return results
+
+
+def bench_texts(files: list[Path], backends: list[str], threads: int = None) -> dict:
+    texts = [t for t in (read_text_head(p, TEXT_MAX_CHARS) for p in files) if t.strip()]
+
+    results = {}
+    for backend in backends:
+        model = load_text_backend(TEXT_MODEL_ID, "cpu", backend, threads)
+        model.encode(texts[:BATCH_SIZE], batch_size=BATCH_SIZE)  # warm-up
+        start = time.perf_counter()
+        emb = model.encode(texts, batch_size=BATCH_SIZE, normalize_embeddings=True, show_progress_bar=False)
+        results[backend] = (np.asarray(emb), time.perf_counter() - start)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark CPU encoder backends")
+    parser.add_argument("--mode", choices=["image", "text"], default="image")
+    parser.add_argument("--input", type=str, required=True, help="Source directory to sample from")
+    parser.add_argument("--sample", type=int, default=256, help="Number of files to encode")
+    parser.add_argument("--threads", type=int, help="Intra-op threads for all backends")
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=list(BACKENDS))
+    args = parser.parse_args()
+
+    backends = ["torch"] + [b for b in args.backends if b != "torch"]
+    if args.mode == "image":
+        files = sample_files(args.input, IMAGE_EXTENSIONS, args.sample)
+        results = bench_images(files, backends, args.threads)
+    else:
+        files = sample_files(args.input, TEXT_EXTENSIONS, args.sample)
+        results = bench_texts(files, backends, args.threads)
+
+    baseline, base_time = results["torch"]
+    n = len(baseline)
+    print(f"\n{args.mode}: {n} items, threads={args.threads or torch.get_num_threads()}")
+    print(f"{'backend':<8} {'items/s':>9} {'speedup':>8} {'mean drift':>11} {'max drift':>10}")
+    for backend, (emb, elapsed) in results.items():
+        drift = 1 - (baseline * emb).sum(axis=1)
+        print(f"{backend:<8} {n / elapsed:>9.1f} {base_time / elapsed:>7.2f}x "
+              f"{drift.mean():>11.5f} {drift.max():>10.5f}")
+
+
+if __name__ == "__main__":
+    main()
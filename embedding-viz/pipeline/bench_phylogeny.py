@@ -0,0 +1,106 @@
+"""
+Benchmark the constrained-graph builders used by phylogeny.py: the blocked
+all-pairs edge list and the sparse graph (temporal window + range search).
+Runs on synthetic clustered embeddings with timestamps spread over a few years
+(or on the stored embeddings with --mode), and reports wall time, peak traced
+memory and edge count per N, builder and thread count. Up to --check-max items the result
+is compared against the original per-pair Python loop.
+
+    uv run python bench_phylogeny.py --sizes 1000 10000 50000 --workers 1 4
+"""
+import argparse
+import time
+import tracemalloc
+import numpy as np
+from phylogeny import SIMILARITY_THRESHOLD, TEMPORAL_THRESHOLD, build_sparse_constrained_graph, constrained_edges
+from store import DATA_DIR, load_store
+
+DIM = 512
+SPAN_DAYS = 3 * 365
+
+
+def synthetic(n: int, dim: int = DIM, seed: int = 0) -> tuple[np.ndarray, np.ndarray]:
+    """Unit vectors around n/50 centres, and timestamps uniform over SPAN_DAYS."""
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((max(1, n // 50), dim)).astype(np.float32)
+    x = centres[rng.integers(len(centres), size=n)] + 0.35 * rng.standard_normal((n, dim)).astype(np.float32)
+    x /= np.linalg.norm(x, axis=1, keepdims=True)
+    timestamps = 1_600_000_000 + rng.integers(0, SPAN_DAYS * 86400, size=n)
+    return x, timestamps.astype(np.int64)
+
+
+def loop_edges(similarity: np.ndarray, timestamps: np.ndarray) -> dict:
+    """The original double loop, as {(i, j): dist} for i < j."""
+    edges = {}
+    n = len(timestamps)
+    for i in range(n):
+        for j in range(i + 1, n):
+            time_diff = abs(timestamps[i] - timestamps[j])
+            sim = similarity[i, j]
+            if time_diff < TEMPORAL_THRESHOLD or sim > SIMILARITY_THRESHOLD:
+                dist = 1 - sim
+                dist += (time_diff / TEMPORAL_THRESHOLD) * 0.01
+                edges[(i, j)] = dist
+    return edges
+
+
+BUILDERS = {
+    "tiles": lambda x, ts, workers: len(constrained_edges(ts, embeddings=x, workers=workers)[0]),
+    "sparse": lambda x, ts, workers: build_sparse_constrained_graph(x, ts, workers=workers).nnz,
+}
+
+
+def run(x: np.ndarray, timestamps: np.ndarray, builder: str, workers: int) -> dict:
+    tracemalloc.start()
+    start = time.perf_counter()
+    edges = BUILDERS[builder](x, timestamps, workers)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"time": elapsed, "peak_mb": peak / 2**20, "edges": edges}
+
+
+def matches_loop(x: np.ndarray, timestamps: np.ndarray) -> bool:
+    similarity = x @ x.T
+    expected = loop_edges(similarity, timestamps)
+    rows, cols, dist = constrained_edges(timestamps, similarity=similarity)
+    found = dict(zip(zip(rows.tolist(), cols.tolist()), dist.tolist()))
+    return found == expected
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark blocked constrained-graph construction")
+    parser.add_argument("--mode", choices=["image", "text"], help="Use stored embeddings instead of synthetic data")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--builders", nargs="+", choices=list(BUILDERS), default=list(BUILDERS))
+    parser.add_argument("--check-max", type=int, default=2000,
+                        help="Compare against the per-pair loop up to this many items")
+    args = parser.parse_args()
+
+    stored = None
+    if args.mode:
+        meta, embeddings = load_store(args.mode, DATA_DIR)
+        stored = (embeddings, np.array([item["timestamp"] for item in meta["items"]], dtype=np.int64))
+    rng = np.random.default_rng(0)
+
+    print(f"{'N':>7} {'builder':<7} {'workers':>7} {'time s':>8} {'peak MB':>8} {'edges':>11} {'identical':>9}")
+    for n in args.sizes:
+        if stored is None:
+            x, timestamps = synthetic(n)
+        elif n > len(stored[0]):
+            print(f"Skipping N={n}: only {len(stored[0])} embeddings stored")
+            continue
+        else:
+            idx = np.sort(rng.choice(len(stored[0]), n, replace=False))
+            x, timestamps = np.ascontiguousarray(stored[0][idx]), stored[1][idx]
+        identical = ("yes" if matches_loop(x, timestamps) else "NO") if n <= args.check_max else "-"
+        for builder in args.builders:
+            for workers in args.workers:
+                result = run(x, timestamps, builder, workers)
+                print(f"{n:>7} {builder:<7} {workers:>7} {result['time']:>8.2f} {result['peak_mb']:>8.1f} "
+                      f"{result['edges']:>11} {identical:>9}")
+
+
+if __name__ == "__main__":
+    main()
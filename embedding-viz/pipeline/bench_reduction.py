@@ -0,0 +1,85 @@
+"""
+Benchmark linear pre-reduction ahead of UMAP on the stored embeddings.
+For each N and configuration, reports wall time (reduction + kNN graph + UMAP), peak
+traced memory, kNN recall of the reduced space against exact full-dimension
+neighbours, and the trustworthiness of the final 2D layout.
+
+    uv run python bench_reduction.py --mode image --sizes 1000 5000 20000 --dims 32 64 128
+"""
+import argparse
+import time
+import tracemalloc
+import numpy as np
+import umap
+from sklearn.manifold import trustworthiness
+from neighbors import build_knn_graph
+from reduction import REDUCTIONS, reduce_embeddings
+from store import DATA_DIR, load_store
+
+RECALL_K = 15
+UMAP_NEIGHBORS = 15  # matches cluster.py
+TRUST_MAX_N = 10000  # trustworthiness is O(N^2) memory; subsample above this
+
+
+def exact_knn(x: np.ndarray, k: int, block: int = 2048) -> np.ndarray:
+    """Exact cosine kNN (excluding self) by blocked matrix multiply."""
+    x = x / np.linalg.norm(x, axis=1, keepdims=True)
+    out = np.empty((len(x), k), dtype=np.int64)
+    for start in range(0, len(x), block):
+        sims = x[start:start + block] @ x.T
+        sims[np.arange(len(sims)), np.arange(start, start + len(sims))] = -np.inf
+        out[start:start + block] = np.argpartition(-sims, k, axis=1)[:, :k]
+    return out
+
+
+def knn_recall(truth: np.ndarray, found: np.ndarray) -> float:
+    k = truth.shape[1]
+    return float(np.mean([len(np.intersect1d(t, f, assume_unique=True)) / k for t, f in zip(truth, found)]))
+
+
+def run_config(x: np.ndarray, method: str, dim: int) -> dict:
+    tracemalloc.start()
+    start = time.perf_counter()
+    _, reduced = reduce_embeddings(x, method, dim)
+    graph = build_knn_graph(reduced)
+    coords = umap.UMAP(
+        n_components=2, n_neighbors=UMAP_NEIGHBORS, min_dist=0.1, metric="cosine", random_state=42,
+        precomputed_knn=graph.umap_knn(UMAP_NEIGHBORS),
+    ).fit_transform(reduced)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"time": elapsed, "peak_mb": peak / 2**20, "reduced": reduced, "coords": coords}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark PCA / random-projection pre-reduction before UMAP")
+    parser.add_argument("--mode", choices=["image", "text"], default="image")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 5000, 20000])
+    parser.add_argument("--dims", type=int, nargs="+", default=[32, 64, 128])
+    parser.add_argument("--methods", nargs="+", choices=[r for r in REDUCTIONS if r != "none"],
+                        default=["pca", "random"])
+    args = parser.parse_args()
+
+    _, embeddings = load_store(args.mode, DATA_DIR)
+    rng = np.random.default_rng(0)
+    configs = [("none", embeddings.shape[1])] + [(m, d) for m in args.methods for d in args.dims]
+
+    print(f"{'N':>7} {'method':<7} {'dim':>4} {'time s':>8} {'peak MB':>8} {'kNN recall':>11} {'trust':>7}")
+    for n in args.sizes:
+        if n > len(embeddings):
+            print(f"Skipping N={n}: only {len(embeddings)} embeddings stored")
+            continue
+        x = np.ascontiguousarray(embeddings[np.sort(rng.choice(len(embeddings), n, replace=False))])
+        truth = exact_knn(x, RECALL_K)
+        trust_idx = np.sort(rng.choice(n, min(n, TRUST_MAX_N), replace=False))
+        for method, dim in configs:
+            result = run_config(x, method, dim)
+            recall = knn_recall(truth, exact_knn(result["reduced"], RECALL_K))
+            trust = trustworthiness(x[trust_idx], result["coords"][trust_idx], n_neighbors=RECALL_K, metric="cosine")
+            print(f"{n:>7} {method:<7} {dim:>4} {result['time']:>8.2f} {result['peak_mb']:>8.1f} "
+                  f"{recall:>11.3f} {trust:>7.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Content-addressed embedding cache so repeat runs only encode new or changed files.
+
+Entries are keyed on a hash of the file bytes, namespaced by model id and
+preprocessing params. A (size, mtime) memo per path avoids re-hashing files
+that have not been touched since the last run.
+"""
+import hashlib
+import json
+import os
+from pathlib import Path
+import numpy as np
+
+CACHE_DIR = Path(__file__).parent.parent / "data" / "cache"
+HASH_CHUNK = 1 << 20
+
+
+def file_digest(path: Path) -> str:
+    """Hash file contents in chunks (blake2b, 128-bit)."""
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class EmbeddingCache:
+    """Persistent map of content hash -> normalized embedding for one model config."""
+
+    def __init__(self, model_id: str, params: dict = None, cache_dir: Path = CACHE_DIR):
+        self.model_id = model_id
+        self.params = params or {}
+        fingerprint = json.dumps({"model": model_id, **self.params}, sort_keys=True, default=str)
+        self.namespace = hashlib.blake2b(fingerprint.encode(), digest_size=8).hexdigest()
+        self.dir = Path(cache_dir) / self.namespace
+        self.vectors_path = self.dir / "vectors.f32"
+        self.hits = 0
+        self.misses = 0
+        self.dim = 0
+        self._rows: dict[str, int] = {}
+        self._stats: dict[str, list] = {}
+        self._vectors = None  # memmap over the rows already on disk
+        self._new: list[np.ndarray] = []
+        self._load()
+
+    def _load(self):
+        index_path = self.dir / "index.json"
+        if not index_path.exists() or not self.vectors_path.exists():
+            return
+        try:
+            with open(index_path) as f:
+                index = json.load(f)
+            keys = index.get("keys", [])
+            self.dim = index.get("dim", 0)
+            # Rows past len(keys) are from an interrupted save; the next save overwrites them.
+            self._vectors = self._map(len(keys))
+        except Exception as e:
+            print(f"Ignoring unreadable embedding cache {self.dir}: {e}")
+            self.dim = 0
+            return
+        self._rows = {k: i for i, k in enumerate(keys)}
+        self._stats = index.get("stats", {})
+
+    def _map(self, rows: int):
+        if not rows or not self.dim:
+            return None
+        return np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(rows, self.dim))
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def key_for(self, path: Path, stat: os.stat_result = None) -> str:
+        """Content key for a file, reusing the stored hash when size/mtime are unchanged."""
+        stat = stat or path.stat()
+        abspath = os.path.abspath(path)
+        memo = self._stats.get(abspath)
+        if memo and memo[0] == stat.st_size and memo[1] == stat.st_mtime_ns:
+            return memo[2]
+        digest = file_digest(path)
+        self._stats[abspath] = [stat.st_size, stat.st_mtime_ns, digest]
+        return digest
+
+    def get(self, key: str) -> np.ndarray | None:
+        row = self._rows.get(key)
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        saved = self._saved_rows()
+        if row < saved:
+            return np.array(self._vectors[row], dtype=np.float32)
+        return self._new[row - saved]
+
+    def put(self, key: str, embedding: np.ndarray):
+        if key in self._rows:
+            return
+        self._rows[key] = self._saved_rows() + len(self._new)
+        self._new.append(np.asarray(embedding, dtype=np.float32))
+
+    def _saved_rows(self) -> int:
+        return 0 if self._vectors is None else len(self._vectors)
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def report(self) -> str:
+        total = self.hits + self.misses
+        return (f"Cache: {self.hits}/{total} hits ({self.hit_rate:.1%}), "
+                f"{self.misses} encoded, {len(self)} entries [{self.namespace}]")
+
+    def save(self):
+        """
+        Append new rows to vectors.f32, then rewrite the index atomically.
+        Cost is proportional to the new rows, so it is cheap to call after every shard.
+        """
+        if not self._new and not self._stats:
+            return
+        self.dir.mkdir(parents=True, exist_ok=True)
+        saved = self._saved_rows()
+        if self._new:
+            new = np.stack(self._new).astype(np.float32, copy=False)
+            self.dim = new.shape[1]
+            self._vectors = None  # release the map before growing the file
+            with open(self.vectors_path, "r+b" if self.vectors_path.exists() else "wb") as f:
+                f.seek(saved * self.dim * 4)
+                f.write(new.tobytes())
+                f.truncate()
+            self._new = []
+        keys = [None] * len(self._rows)
+        for k, i in self._rows.items():
+            keys[i] = k
+        tmp = self.dir / "index.tmp.json"
+        with open(tmp, "w") as f:
+            json.dump({
+                "model": self.model_id,
+                "params": self.params,
+                "dim": self.dim,
+                "keys": keys,
+                "stats": self._stats,
+            }, f, default=str)
+        os.replace(tmp, self.dir / "index.json")
+        self._vectors = self._map(len(keys))
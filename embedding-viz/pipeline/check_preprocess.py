@@ -0,0 +1,66 @@
+"""
+Regression check: fast preprocessing vs CLIPProcessor on a sample of images.
+Exits non-zero if any embedding drifts below the cosine tolerance.
+
+    uv run python check_preprocess.py --input /path/to/images --sample 64
+"""
+import argparse
+import random
+import sys
+from pathlib import Path
+import numpy as np
+import torch
+from embed import IMAGE_EXTENSIONS, BATCH_SIZE, load_clip_model, load_image_batch
+from preprocess import FastImagePreprocessor
+from scan import scan_files
+
+COSINE_TOLERANCE = 0.98
+
+
+def encode(model, device, inputs: dict) -> np.ndarray:
+    inputs = {k: v.to(device) for k, v in inputs.items()}
+    with torch.no_grad():
+        emb = model.get_image_features(**inputs).cpu().numpy()
+    return emb / np.linalg.norm(emb, axis=1, keepdims=True)
+
+
+def compare(model, processor, device, paths: list[Path]) -> np.ndarray:
+    """Per-image cosine similarity between the two preprocessing paths."""
+    fast = FastImagePreprocessor(processor)
+    cosines = []
+    for i in range(0, len(paths), BATCH_SIZE):
+        batch = paths[i:i + BATCH_SIZE]
+        ref_paths, ref_inputs = load_image_batch(processor, batch)
+        fast_paths, fast_inputs = fast(ref_paths)
+        if ref_inputs is None or fast_inputs is None or fast_paths != ref_paths:
+            continue
+        ref = encode(model, device, ref_inputs)
+        new = encode(model, device, fast_inputs)
+        cosines.extend((ref * new).sum(axis=1).tolist())
+    return np.array(cosines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check fast image preprocessing against CLIPProcessor")
+    parser.add_argument("--input", type=str, required=True, help="Image directory to sample from")
+    parser.add_argument("--sample", type=int, default=64, help="Number of images to compare")
+    parser.add_argument("--tolerance", type=float, default=COSINE_TOLERANCE, help="Minimum allowed cosine")
+    args = parser.parse_args()
+
+    files = [f.path for f in scan_files(Path(args.input), IMAGE_EXTENSIONS)]
+    random.Random(0).shuffle(files)
+    files = files[:args.sample]
+    print(f"Comparing {len(files)} images")
+
+    model, processor, device = load_clip_model()
+    cosines = compare(model, processor, device, files)
+    if not len(cosines):
+        print("No images could be compared")
+        return 1
+    print(f"Cosine vs CLIPProcessor: mean {cosines.mean():.5f}, min {cosines.min():.5f} "
+          f"(tolerance {args.tolerance})")
+    return 0 if cosines.min() >= args.tolerance else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,66 @@
+"""
+Overlapping token-window chunking and chunk pooling for long text documents.
+Files are read and tokenized block by block, so multi-megabyte notes never sit in memory whole.
+"""
+from pathlib import Path
+import numpy as np
+
+CHUNK_OVERLAP = 32  # tokens shared between consecutive windows
+CHUNK_BLOCK_CHARS = 16_000  # characters read/tokenized per step
+ATTENTION_TEMPERATURE = 0.1
+POOLING_MODES = ("mean", "attention")
+
+
+def iter_token_windows(path: Path, tokenizer, window: int, overlap: int = CHUNK_OVERLAP,
+                       block_chars: int = CHUNK_BLOCK_CHARS):
+    """Yield overlapping windows of token ids covering the whole file."""
+    stride = max(1, window - overlap)
+    pending: list[int] = []
+    carry = ""
+    emitted = False
+
+    with open(path, encoding="utf-8", errors="ignore") as f:
+        while True:
+            block = f.read(block_chars)
+            eof = not block
+            text = carry + block
+            carry = ""
+            if not eof:
+                # Never split a word across blocks: hold back the trailing partial word.
+                cut = max(text.rfind(" "), text.rfind("\n"))
+                if cut > 0:
+                    text, carry = text[:cut], text[cut:]
+            if text.strip():
+                pending.extend(tokenizer(text, add_special_tokens=False, verbose=False)["input_ids"])
+            while len(pending) >= window:
+                yield pending[:window]
+                emitted = True
+                del pending[:stride]
+            if eof:
+                break
+
+    # The tail only matters if it holds tokens not already covered by the last window.
+    if pending and (not emitted or len(pending) > overlap):
+        yield pending
+
+
+def iter_chunk_texts(path: Path, tokenizer, window: int, overlap: int = CHUNK_OVERLAP):
+    """Yield chunk strings (decoded token windows) for a file."""
+    for ids in iter_token_windows(path, tokenizer, window, overlap):
+        yield tokenizer.decode(ids)
+
+
+def pool_chunks(chunks: np.ndarray, pooling: str = "mean") -> np.ndarray:
+    """
+    Pool normalized chunk vectors into one normalized document vector.
+    "attention" weights each chunk by softmax(similarity to the chunk mean), so
+    chunks on the document's main topic dominate over boilerplate.
+    """
+    if pooling == "attention" and len(chunks) > 1:
+        query = chunks.mean(axis=0)
+        scores = chunks @ query / ATTENTION_TEMPERATURE
+        weights = np.exp(scores - scores.max())
+        doc = (weights / weights.sum()) @ chunks
+    else:
+        doc = chunks.mean(axis=0)
+    return doc / max(float(np.linalg.norm(doc)), 1e-12)
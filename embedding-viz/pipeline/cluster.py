@@ -1,17 +1,32 @@
 """
 UMAP dimensionality reduction and HDBSCAN clustering with semantic labels.
-Uses CLIP zero-shot for images, keyword extraction for text.
+Uses CLIP zero-shot (scored against stored embeddings) for images, class-based TF-IDF terms for text.
 """
+import argparse
 import json
 from pathlib import Path
 from collections import Counter
 import numpy as np
 import umap
 import hdbscan
+from store import load_store
+from table import ItemTable
+from density import save_contours
+from tiles import write_tiles
+from output import write_browser_output, write_json
+from labeling import class_tfidf_terms, encode_label_prompts, label_clusters_by_embedding
+from neighbors import KnnGraph, load_knn_graph
+from reduction import REDUCE_DIM, REDUCTIONS, reduce_embeddings
+from hierarchy import load_hierarchy, recut_labels, save_hierarchy, unchanged_labels
+from incremental import REFIT_FRACTION, clear_state, load_state, new_state, save_state, update_layout
 
 DATA_DIR = Path(__file__).parent.parent / "data"
 FRONTEND_PUBLIC_DATA_DIR = Path(__file__).parent.parent / "frontend" / "public" / "data"
 
+MIN_CLUSTER_SIZE = 5
+MIN_SAMPLES = 3
+UMAP_NEIGHBORS = 15
+
 # Candidate labels for zero-shot image classification
 IMAGE_LABELS = [
     "landscape painting", "portrait", "architecture", "vehicle", "car",
@@ -25,31 +40,30 @@ IMAGE_LABELS = [
 ]
 
 
-def load_embeddings(mode: str = None) -> dict:
-    """Load raw embeddings from JSON."""
-    # Try mode-specific file first, fall back to generic
-    if mode:
-        path = DATA_DIR / f"embeddings_raw_{mode}.json"
-        if path.exists():
-            with open(path) as f:
-                return json.load(f)
-    with open(DATA_DIR / "embeddings_raw.json") as f:
-        return json.load(f)
+def load_embeddings(mode: str = None) -> tuple[dict, np.ndarray]:
+    """Load item metadata and the embedding matrix (memory-mapped binary store, or legacy JSON)."""
+    return load_store(mode, DATA_DIR)
 
 
-def run_umap(embeddings: np.ndarray) -> np.ndarray:
-    """Project embeddings to 2D using UMAP."""
+def fit_umap(embeddings: np.ndarray, knn: KnnGraph = None) -> tuple[umap.UMAP, np.ndarray]:
+    """Fit UMAP and project embeddings to 2D (reusing a precomputed kNN graph if given); returns (reducer, coords)."""
     print("Running UMAP projection...")
     reducer = umap.UMAP(
         n_components=2,
-        n_neighbors=15,
+        n_neighbors=UMAP_NEIGHBORS,
         min_dist=0.1,
         metric='cosine',
-        random_state=42
+        random_state=42,
+        precomputed_knn=knn.umap_knn(UMAP_NEIGHBORS) if knn is not None else (None, None, None)
     )
     coords = reducer.fit_transform(embeddings)
     print(f"UMAP complete: {coords.shape}")
-    return coords
+    return reducer, coords
+
+
+def run_umap(embeddings: np.ndarray) -> np.ndarray:
+    """Project embeddings to 2D using UMAP."""
+    return fit_umap(embeddings)[1]
 
 
 def _fallback_image_label(image_paths: list[str]) -> str:
@@ -85,193 +99,240 @@ def _fallback_image_label(image_paths: list[str]) -> str:
     return counts.most_common(1)[0][0].title()
 
 
-def get_image_semantic_label(model, processor, device, image_paths: list[str], top_k: int = 1) -> str:
-    """Use CLIP zero-shot to classify cluster content (fallbacks locally if unavailable)."""
-    sample_paths = image_paths[:5]
-    
-    images = []
-    for path in sample_paths:
-        try:
-            from PIL import Image  # lazy import (optional dep)
-            img = Image.open(path).convert("RGB")
-            images.append(img)
-        except:
-            continue
-    
-    if not images:
-        return _fallback_image_label(image_paths)
-
-    try:
-        import torch  # lazy import (optional dep)
-    except Exception:
-        return _fallback_image_label(image_paths)
-    
-    text_inputs = processor(
-        text=[f"a photo of {label}" for label in IMAGE_LABELS],
-        return_tensors="pt",
-        padding=True
-    ).to(device)
-    
-    with torch.no_grad():
-        text_features = model.get_text_features(**text_inputs)
-        text_features = text_features / text_features.norm(dim=-1, keepdim=True)
-    
-    label_scores = torch.zeros(len(IMAGE_LABELS), device=device)
-    
-    for img in images:
-        image_inputs = processor(images=img, return_tensors="pt").to(device)
-        with torch.no_grad():
-            image_features = model.get_image_features(**image_inputs)
-            image_features = image_features / image_features.norm(dim=-1, keepdim=True)
-            similarity = (image_features @ text_features.T).squeeze(0)
-            label_scores += similarity
-    
-    label_scores = label_scores / len(images)
-    top_indices = label_scores.topk(top_k).indices.cpu().numpy()
-    
-    labels = [IMAGE_LABELS[i].title() for i in top_indices]
-    # Single-label clusters only (no "X/Y" compound titles).
-    return labels[0] if labels else _fallback_image_label(image_paths)
-
-
-def get_text_cluster_label(items: list[dict]) -> str:
-    """Extract meaningful label from text content using common words."""
-    # Common stopwords to filter out
-    stopwords = {
-        'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for',
-        'of', 'with', 'by', 'from', 'is', 'are', 'was', 'were', 'be', 'been',
-        'being', 'have', 'has', 'had', 'do', 'does', 'did', 'will', 'would',
-        'could', 'should', 'may', 'might', 'must', 'shall', 'can', 'this',
-        'that', 'these', 'those', 'i', 'you', 'he', 'she', 'it', 'we', 'they',
-        'what', 'which', 'who', 'when', 'where', 'why', 'how', 'all', 'each',
-        'every', 'both', 'few', 'more', 'most', 'other', 'some', 'such', 'no',
-        'not', 'only', 'same', 'so', 'than', 'too', 'very', 'just', 'also',
-        'now', 'here', 'there', 'then', 'if', 'as', 'because', 'until', 'while',
-        'about', 'into', 'through', 'during', 'before', 'after', 'above', 'below'
-    }
-    
-    # Get first 500 chars from each item's preview or read from file
-    word_counts = Counter()
-    
-    for item in items[:10]:  # Sample up to 10 items
-        text = item.get("preview", "")
+def cluster_texts(table: ItemTable) -> list[str]:
+    """One text per item for term labeling: stored full_text/preview, else the file head (read once)."""
+    texts = table.get("full_text")
+    if texts is None:
+        texts = table.get("preview")
+    if texts is None:
+        texts = [None] * len(table)
+    out = []
+    for text, path in zip(texts, table["content"]):
         if not text:
             try:
-                text = Path(item["content"]).read_text(encoding="utf-8", errors="ignore")[:500]
-            except:
-                continue
-        
-        # Extract words
-        words = text.lower().split()
-        words = [w.strip('.,!?()[]{}":;-_#*') for w in words]
-        words = [w for w in words if len(w) > 3 and w not in stopwords and w.isalpha()]
-        word_counts.update(words)
-    
-    # Get top words
-    top_words = [word for word, _ in word_counts.most_common(3)]
-    if top_words:
-        # Single-label clusters only (no "X/Y" compound titles).
-        return top_words[0].title()
-    return "misc"
+                text = Path(path).read_text(encoding="utf-8", errors="ignore")[:4000]
+            except Exception:
+                text = ""
+        out.append(text)
+    return out
 
 
-def run_clustering(coords: np.ndarray, items: list[dict], mode: str, model=None, processor=None, device=None) -> tuple[np.ndarray, list[dict]]:
-    """Cluster points using HDBSCAN and generate semantic labels."""
+def fit_hdbscan(coords: np.ndarray) -> tuple[hdbscan.HDBSCAN, np.ndarray]:
+    """Fit HDBSCAN on the 2D layout (keeping prediction data for incremental assignment)."""
     print("Running HDBSCAN clustering...")
     clusterer = hdbscan.HDBSCAN(
-        min_cluster_size=5,
-        min_samples=3,
-        metric='euclidean'
+        min_cluster_size=MIN_CLUSTER_SIZE,
+        min_samples=MIN_SAMPLES,
+        metric='euclidean',
+        prediction_data=True
     )
     labels = clusterer.fit_predict(coords)
-    
+    return clusterer, labels
+
+
+def run_clustering(coords: np.ndarray, table: ItemTable, mode: str, embeddings: np.ndarray = None,
+                   label_features: np.ndarray = None) -> tuple[np.ndarray, list[dict]]:
+    """Cluster points using HDBSCAN and generate semantic labels."""
+    _, labels = fit_hdbscan(coords)
+    return labels, label_clusters(coords, labels, table, mode, embeddings, label_features)
+
+
+def label_clusters(coords: np.ndarray, labels: np.ndarray, table: ItemTable, mode: str,
+                   embeddings: np.ndarray = None, label_features: np.ndarray = None,
+                   known: dict[int, str] = None) -> list[dict]:
+    """Build the cluster list (label, centroid, size) for a flat clustering; `known` labels are reused as-is."""
     clusters = []
-    unique_labels = set(labels) - {-1}
+    known = known or {}
+    cluster_ids, members = table.group_rows(labels)
     
     print("Generating cluster labels...")
-    for cluster_id in sorted(unique_labels):
-        mask = labels == cluster_id
-        centroid = coords[mask].mean(axis=0)
-        
-        cluster_items = [items[i] for i in range(len(items)) if mask[i]]
-        
-        if mode == "image":
-            image_paths = [item["content"] for item in cluster_items]
-            label = get_image_semantic_label(model, processor, device, image_paths)
+    image_labels = {}
+    if mode == "image" and label_features is not None and embeddings is not None:
+        pending = np.where(np.isin(labels, list(known)), -1, labels)
+        image_labels = label_clusters_by_embedding(embeddings, pending, IMAGE_LABELS, label_features)
+    text_terms = {}
+    if mode == "text" and len(set(cluster_ids.tolist()) - set(known)):
+        text_terms = class_tfidf_terms(cluster_texts(table), labels)
+    
+    # Grouped centroids/sizes via bincount over the cluster index of every non-noise row.
+    valid = labels >= 0
+    group = np.searchsorted(cluster_ids, labels[valid])
+    sizes = np.bincount(group, minlength=len(cluster_ids))
+    centroids = np.stack([np.bincount(group, weights=coords[valid, d], minlength=len(cluster_ids))
+                          for d in range(coords.shape[1])], axis=1) / np.maximum(sizes, 1)[:, None]
+    
+    paths = table["content"]
+    for cluster_id, rows, centroid, size in zip(cluster_ids, members, centroids, sizes):
+        if int(cluster_id) in known:
+            label = known[int(cluster_id)]
+        elif mode == "image":
+            label = image_labels.get(int(cluster_id)) or _fallback_image_label(paths[rows].tolist())
         else:
-            label = get_text_cluster_label(cluster_items)
+            # Single-label clusters only (no "X/Y" compound titles); the runners-up ship as "terms".
+            terms = text_terms.get(int(cluster_id), [])
+            label = terms[0].title() if terms else "misc"
         
-        clusters.append({
+        cluster = {
             "id": int(cluster_id),
             "label": label,
             "centroid": centroid.tolist(),
-            "size": int(mask.sum())
-        })
-        print(f"  Cluster {cluster_id}: {label} ({mask.sum()} items)")
+            "size": int(size)
+        }
+        if text_terms.get(int(cluster_id)):
+            cluster["terms"] = text_terms[int(cluster_id)]
+        clusters.append(cluster)
+        print(f"  Cluster {cluster_id}: {label} ({size} items)")
     
     print(f"Found {len(clusters)} clusters, {(labels == -1).sum()} noise points")
     
-    return labels, clusters
+    return clusters
+
+
+def layout(embeddings: np.ndarray, keys: list[str], mode: str, incremental: bool = False,
+           refit: bool = False, refit_fraction: float = REFIT_FRACTION, reduce: str = "none",
+           reduce_dim: int = REDUCE_DIM) -> tuple[np.ndarray, np.ndarray]:
+    """
+    UMAP coords + HDBSCAN labels, optionally on linearly pre-reduced embeddings. In
+    incremental mode, reuse the persisted models and only place new items, unless a
+    refit is forced or due.
+    """
+    reduction = (reduce, reduce_dim if reduce != "none" else None)
+    if incremental and not refit:
+        state = load_state(mode)
+        if state and state.get("reduction", ("none", None)) != reduction:
+            print(f"Saved layout used reduction {state.get('reduction')}; refitting")
+            state = None
+        result = update_layout(state, embeddings, keys, refit_fraction) if state else None
+        if result is not None:
+            coords, labels, state = result
+            save_state(mode, state)
+            return coords, labels
+    
+    projection, reduced = reduce_embeddings(embeddings, reduce, reduce_dim)
+    reducer, coords = fit_umap(reduced, load_knn_graph(reduced, mode))
+    clusterer, labels = fit_hdbscan(coords)
+    save_hierarchy(mode, clusterer, keys)
+    if incremental:
+        save_state(mode, new_state(reducer, clusterer, keys, coords, labels, projection, reduction))
+    return coords, labels
 
 
-def main(mode: str = None):
-    data = load_embeddings(mode)
-    items = data["items"]
+def clustered_path(mode: str) -> Path:
+    # Keep legacy filenames used by the frontend/data loader.
+    # - image mode: embeddings_clustered.json
+    # - text mode:  embeddings_clustered_text.json
+    suffix = "_text" if mode == "text" else ""
+    return DATA_DIR / f"embeddings_clustered{suffix}.json"
+
+
+def save_output(output: dict, mode: str, coords: np.ndarray, labels: np.ndarray):
+    # Full clustered data (pipeline-internal: phylogeny and --recut read it back).
+    output_path = clustered_path(mode)
+    write_json(output, [output_path])
+    print(f"Saved clustered data to {output_path}")
+
+    # Slim browser payload in the Vite public data directory so the app picks it up immediately.
+    # main.js loads:
+    # - /data/embeddings_image.json
+    # - /data/embeddings_text.json
+    public_name = "embeddings_text.json" if mode == "text" else "embeddings_image.json"
+    payload = write_browser_output(output, mode, FRONTEND_PUBLIC_DATA_DIR, public_name)
+    write_tiles(FRONTEND_PUBLIC_DATA_DIR / f"tiles_{mode}", coords, labels, payload["items"], payload["clusters"])
+
+
+def load_label_features(mode: str) -> np.ndarray | None:
+    if mode != "image":
+        return None
+    try:
+        return encode_label_prompts(IMAGE_LABELS)
+    except Exception as e:
+        print(f"CLIP unavailable ({e}); using filename-based fallback labels.")
+        return None
+
+
+def recut(mode: str, min_cluster_size: int = MIN_CLUSTER_SIZE, epsilon: float = 0.0) -> dict:
+    """
+    New flat clustering from the saved HDBSCAN hierarchy (no UMAP/HDBSCAN refit).
+    Only clusters whose membership changed are relabeled. The saved incremental
+    models still predict the old cut, so they are dropped: the next --incremental
+    run refits (and its HDBSCAN defaults replace the re-cut).
+    """
+    with open(clustered_path(mode)) as f:
+        output = json.load(f)
+    table = ItemTable.from_items(output.pop("items"))
+    hierarchy = load_hierarchy(mode)
+    if hierarchy is None or hierarchy["keys"].tolist() != table["content"].tolist():
+        raise SystemExit("No saved hierarchy for the current clustering; run cluster.py (with --refit if incremental) first")
+    
+    labels = recut_labels(hierarchy["single_linkage"], min_cluster_size, epsilon)
+    known = unchanged_labels(table["cluster"], {c["id"]: c["label"] for c in output["clusters"]}, labels)
+    print(f"Re-cut (min_cluster_size={min_cluster_size}, epsilon={epsilon}): "
+          f"{len(set(labels) - {-1})} clusters, {len(known)} unchanged")
+    
+    changed = len(set(labels) - {-1}) > len(known)
+    embeddings = load_embeddings(mode)[1] if changed and mode == "image" else None
+    label_features = load_label_features(mode) if embeddings is not None else None
+    known_terms = unchanged_labels(table["cluster"], {c["id"]: c["terms"] for c in output["clusters"] if "terms" in c},
+                                   labels)
+    output["clusters"] = label_clusters(table["umap"], labels, table, mode, embeddings, label_features, known)
+    for cluster in output["clusters"]:
+        if cluster["id"] in known_terms:
+            cluster["terms"] = known_terms[cluster["id"]]
+    table.set_column("cluster", labels.astype(np.int32))
+    
+    save_output({"items": table.to_items(), **output}, mode, table["umap"], labels)
+    if clear_state(mode):
+        print("Dropped the saved incremental layout (it predicts the old clusters); the next --incremental run refits")
+    print("Re-run phylogeny.py to refresh species for the new clusters")
+    return output
+
+
+def main(mode: str = None, incremental: bool = False, refit: bool = False, reduce: str = "none",
+         reduce_dim: int = REDUCE_DIM):
+    data, embeddings = load_embeddings(mode)
+    table = ItemTable.from_items(data.pop("items"))
     # Prefer explicit mode passed to main() since raw files may not include "mode".
     mode = mode or data.get("mode", "image")
     
     print(f"Mode: {mode}")
     
-    model, processor, device = None, None, None
-    if mode == "image":
-        try:
-            import torch
-            from transformers import CLIPProcessor, CLIPModel
-            print("Loading CLIP for semantic labeling...")
-            model = CLIPModel.from_pretrained("openai/clip-vit-base-patch32")
-            processor = CLIPProcessor.from_pretrained("openai/clip-vit-base-patch32")
-            device = "mps" if torch.backends.mps.is_available() else "cuda" if torch.cuda.is_available() else "cpu"
-            model = model.to(device)
-            model.eval()
-        except Exception as e:
-            print(f"CLIP unavailable ({e}); using filename-based fallback labels.")
+    label_features = load_label_features(mode)
     
-    embeddings = np.array([item["embedding"] for item in items])
-    coords = run_umap(embeddings)
-    labels, clusters = run_clustering(coords, items, mode, model, processor, device)
+    coords, labels = layout(embeddings, table["content"].tolist(), mode, incremental, refit,
+                            reduce=reduce, reduce_dim=reduce_dim)
+    clusters = label_clusters(coords, labels, table, mode, embeddings, label_features)
     
-    for i, item in enumerate(items):
-        item["umap"] = coords[i].tolist()
-        item["cluster"] = int(labels[i])
+    table.set_column("umap", np.asarray(coords, dtype=np.float32))
+    save_contours(coords, [DATA_DIR / f"contours_{mode}.json", FRONTEND_PUBLIC_DATA_DIR / f"contours_{mode}.json"])
+    table.set_column("cluster", np.asarray(labels, dtype=np.int32))
     
     output = {
-        "items": items,
+        "items": table.to_items(),
         "clusters": clusters,
         "mode": mode
     }
-    
-    # Keep legacy filenames used by the frontend/data loader.
-    # - image mode: embeddings_clustered.json
-    # - text mode:  embeddings_clustered_text.json
-    suffix = "_text" if mode == "text" else ""
-    output_path = DATA_DIR / f"embeddings_clustered{suffix}.json"
-    with open(output_path, "w") as f:
-        json.dump(output, f)
-
-    # Also write directly to the Vite public data directory so the app picks it up immediately.
-    # main.js loads:
-    # - /data/embeddings_image.json
-    # - /data/embeddings_text.json
-    FRONTEND_PUBLIC_DATA_DIR.mkdir(parents=True, exist_ok=True)
-    public_name = "embeddings_text.json" if mode == "text" else "embeddings_image.json"
-    public_path = FRONTEND_PUBLIC_DATA_DIR / public_name
-    with open(public_path, "w") as f:
-        json.dump(output, f)
-    
-    print(f"Saved clustered data to {output_path}")
-    print(f"Saved clustered data to {public_path}")
+    save_output(output, mode, coords, labels)
     return output
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="UMAP + HDBSCAN clustering with semantic labels")
+    parser.add_argument("--mode", choices=["image", "text"], help="Embedding mode: image or text")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Reuse persisted UMAP/HDBSCAN models and only place new items")
+    parser.add_argument("--refit", action="store_true", help="Force a full refit (and re-save models)")
+    parser.add_argument("--reduce", choices=REDUCTIONS, default="none",
+                        help="Linear pre-reduction before the kNN graph and UMAP")
+    parser.add_argument("--reduce-dim", type=int, default=REDUCE_DIM, help="Target dimension for --reduce")
+    parser.add_argument("--recut", action="store_true",
+                        help="Re-cut the saved HDBSCAN hierarchy instead of refitting (needs a previous run; "
+                             "drops the saved --incremental models)")
+    parser.add_argument("--min-cluster-size", type=int, default=MIN_CLUSTER_SIZE, help="--recut: minimum cluster size")
+    parser.add_argument("--epsilon", type=float, default=0.0, help="--recut: cluster_selection_epsilon (UMAP units)")
+    
+    args = parser.parse_args()
+    if args.recut:
+        recut(args.mode or "image", args.min_cluster_size, args.epsilon)
+    else:
+        main(mode=args.mode, incremental=args.incremental, refit=args.refit, reduce=args.reduce,
+             reduce_dim=args.reduce_dim)
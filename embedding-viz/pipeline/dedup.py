@@ -0,0 +1,161 @@
+"""
+Perceptual-hash near-duplicate detection ahead of embedding.
+
+Each image is decoded as a tiny draft thumbnail and reduced to a 64-bit dHash or
+pHash. Near-duplicates (Hamming distance <= radius) are found through a
+multi-index hash table, so only one representative per group is sent to CLIP.
+"""
+import json
+import os
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import numpy as np
+from PIL import Image
+from preprocess import open_image_draft
+
+HASH_METHODS = ("dhash", "phash")
+DEDUP_RADIUS = 4  # max differing bits (of 64) to count as a near-duplicate
+HASH_WORKERS = 8
+
+
+def _pack64(bits: np.ndarray) -> int:
+    return int(np.packbits(bits).view(">u8")[0])
+
+
+def dhash(img: Image.Image) -> int:
+    """Difference hash: sign of horizontal gradients on a 9x8 grayscale thumbnail."""
+    px = np.asarray(img.convert("L").resize((9, 8), Image.BILINEAR), dtype=np.int16)
+    return _pack64((px[:, 1:] > px[:, :-1]).ravel())
+
+
+def phash(img: Image.Image) -> int:
+    """DCT hash: low-frequency 8x8 DCT block of a 32x32 thumbnail, thresholded at its median."""
+    from scipy.fft import dctn
+    px = np.asarray(img.convert("L").resize((32, 32), Image.BILINEAR), dtype=np.float32)
+    low = dctn(px, norm="ortho")[:8, :8].ravel()
+    return _pack64(low > np.median(low[1:]))  # DC term excluded from the threshold
+
+
+def hash_image(path: Path, method: str = "dhash") -> int | None:
+    try:
+        img = open_image_draft(path, min_side=32)
+    except Exception as e:
+        print(f"Skipping hash for {path.name}: {e}")
+        return None
+    return phash(img) if method == "phash" else dhash(img)
+
+
+class HashIndex:
+    """
+    Multi-index hashing over 64-bit hashes.
+    The hash is split into radius+1 bands; by pigeonhole, any hash within `radius`
+    bits agrees exactly on at least one band, so candidates come from exact band lookups.
+    """
+
+    def __init__(self, radius: int = DEDUP_RADIUS, bits: int = 64):
+        self.radius = radius
+        n_bands = radius + 1
+        edges = [round(i * bits / n_bands) for i in range(n_bands + 1)]
+        self.bands = [(lo, (1 << (hi - lo)) - 1) for lo, hi in zip(edges, edges[1:])]
+        self.tables = [defaultdict(list) for _ in self.bands]
+        self.hashes: list[int] = []
+
+    def add(self, h: int) -> int:
+        idx = len(self.hashes)
+        self.hashes.append(h)
+        for table, (shift, mask) in zip(self.tables, self.bands):
+            table[(h >> shift) & mask].append(idx)
+        return idx
+
+    def nearest(self, h: int) -> tuple[int, int] | None:
+        """(index, distance) of the closest stored hash within radius, or None."""
+        best = None
+        seen = set()
+        for table, (shift, mask) in zip(self.tables, self.bands):
+            for idx in table.get((h >> shift) & mask, ()):
+                if idx in seen:
+                    continue
+                seen.add(idx)
+                dist = (h ^ self.hashes[idx]).bit_count()
+                if dist <= self.radius and (best is None or dist < best[1]):
+                    best = (idx, dist)
+        return best
+
+
+def load_hash_memo(path: Path) -> dict:
+    if path is None or not path.exists():
+        return {}
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"Ignoring unreadable hash memo {path}: {e}")
+        return {}
+
+
+def save_hash_memo(path: Path, memo: dict):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w") as f:
+        json.dump(memo, f)
+    os.replace(tmp, path)
+
+
+def compute_hashes(paths: list[Path], method: str = "dhash", workers: int = HASH_WORKERS,
+                   stats: dict = None, memo_path: Path = None) -> list[int | None]:
+    """Hash every path; unchanged files (same size/mtime) reuse the hash stored in memo_path."""
+    memo = load_hash_memo(memo_path)
+    hashes: list[int | None] = [None] * len(paths)
+    todo = []
+    reused = 0
+    for i, path in enumerate(paths):
+        try:
+            st = stats[path] if stats and path in stats else path.stat()
+        except OSError as e:
+            print(f"Skipping {path.name}: {e}")  # hash stays None; the embed step skips it too
+            continue
+        hit = memo.get(os.path.abspath(path))
+        if hit and hit[0] == st.st_size and hit[1] == st.st_mtime_ns:
+            hashes[i] = hit[2]
+            reused += 1
+        else:
+            todo.append((i, path, st))
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for (i, path, st), h in zip(todo, pool.map(lambda t: hash_image(t[1], method), todo)):
+            hashes[i] = h
+            if h is not None:
+                memo[os.path.abspath(path)] = [st.st_size, st.st_mtime_ns, h]
+
+    if memo_path is not None and todo:
+        save_hash_memo(memo_path, memo)
+    print(f"Hashed {len(todo)} images ({reused} unchanged)")
+    return hashes
+
+
+def find_near_duplicates(paths: list[Path], radius: int = DEDUP_RADIUS, method: str = "dhash",
+                         workers: int = HASH_WORKERS, stats: dict = None,
+                         memo_path: Path = None) -> tuple[list[Path], dict[Path, list[Path]]]:
+    """
+    Group near-duplicate images. The first path of each group (in input order,
+    i.e. the oldest) is its representative.
+    Returns (representatives, {representative: [duplicate paths]}).
+    """
+    hashes = compute_hashes(paths, method, workers, stats, memo_path)
+
+    index = HashIndex(radius)
+    indexed: list[Path] = []  # indexed[i] is the representative whose hash is index.hashes[i]
+    reps: list[Path] = []
+    duplicates: dict[Path, list[Path]] = {}
+    for path, h in zip(paths, hashes):
+        match = index.nearest(h) if h is not None else None
+        if match is None:
+            # Unhashable images stay in as their own group; the embed step reports the error.
+            if h is not None:
+                index.add(h)
+                indexed.append(path)
+            reps.append(path)
+        else:
+            duplicates.setdefault(indexed[match[0]], []).append(path)
+    return reps, duplicates
@@ -0,0 +1,149 @@
+"""
+Density field and contour geometry for the topography view.
+
+The UMAP coords are linearly binned onto a grid and convolved with a Gaussian
+kernel by FFT (binned KDE, O(G^2 log G) regardless of N). Iso-density rings are
+traced with marching squares on the zero-padded grid, so every ring is closed, and
+shipped quantized at a few resolutions; the frontend only draws paths.
+"""
+from pathlib import Path
+import numpy as np
+from scipy.signal import fftconvolve
+from output import write_json
+
+# (grid cells per side, Gaussian sd as a fraction of the padded extent): coarse -> fine
+LEVELS = ((64, 0.03), (128, 0.02), (256, 0.012))
+THRESHOLDS = 14
+EXTENT_PAD = 0.08  # matches the frontend's scale padding
+QUANT = 4095  # ring coordinates as integers over the extent
+
+# Marching-squares segments per case (corner bits tl=8, tr=4, br=2, bl=1), as pairs of cell edges.
+# Saddles (5, 10) have two variants, picked by the cell-centre value.
+_T, _R, _B, _L = range(4)
+_SEGMENTS = {
+    1: [(_L, _B)], 2: [(_B, _R)], 3: [(_L, _R)], 4: [(_T, _R)],
+    6: [(_T, _B)], 7: [(_T, _L)], 8: [(_T, _L)], 9: [(_T, _B)],
+    11: [(_T, _R)], 12: [(_L, _R)], 13: [(_B, _R)], 14: [(_L, _B)],
+}
+_SADDLES = {
+    5: ([(_T, _L), (_B, _R)], [(_T, _R), (_L, _B)]),  # (centre inside, centre outside)
+    10: ([(_T, _R), (_L, _B)], [(_T, _L), (_B, _R)]),
+}
+
+
+def padded_extent(coords: np.ndarray, pad: float = EXTENT_PAD) -> tuple[float, float, float, float]:
+    lo, hi = coords.min(axis=0), coords.max(axis=0)
+    span = np.maximum(hi - lo, 1e-9)
+    lo, hi = lo - span * pad, hi + span * pad
+    return float(lo[0]), float(lo[1]), float(hi[0]), float(hi[1])
+
+
+def binned_kde(coords: np.ndarray, extent: tuple, size: int, bandwidth: float) -> np.ndarray:
+    """(size, size) density (rows = y) from linear binning + FFT Gaussian convolution."""
+    x0, y0, x1, y1 = extent
+    gx = (coords[:, 0] - x0) / (x1 - x0) * (size - 1)
+    gy = (coords[:, 1] - y0) / (y1 - y0) * (size - 1)
+    ix, iy = np.clip(np.floor(gx).astype(np.int64), 0, size - 2), np.clip(np.floor(gy).astype(np.int64), 0, size - 2)
+    fx, fy = gx - ix, gy - iy
+    grid = np.zeros(size * size)
+    for dy, wy in ((0, 1 - fy), (1, fy)):
+        for dx, wx in ((0, 1 - fx), (1, fx)):
+            grid += np.bincount((iy + dy) * size + ix + dx, weights=wy * wx, minlength=size * size)
+    grid = grid.reshape(size, size)
+
+    sd = bandwidth * (size - 1)  # in cells
+    radius = max(1, int(np.ceil(4 * sd)))
+    t = np.arange(-radius, radius + 1)
+    kernel = np.exp(-0.5 * (t / sd) ** 2)
+    kernel /= kernel.sum()
+    density = fftconvolve(grid, np.outer(kernel, kernel), mode="same")
+    return np.maximum(density, 0)
+
+
+def _edge_points(grid: np.ndarray, threshold: float):
+    """Crossing point (x, y in grid units) for every grid edge, keyed by edge id."""
+    h, w = grid.shape
+    with np.errstate(divide="ignore", invalid="ignore"):
+        th = (threshold - grid[:, :-1]) / (grid[:, 1:] - grid[:, :-1])  # horizontal edges (i, j)-(i, j+1)
+        tv = (threshold - grid[:-1, :]) / (grid[1:, :] - grid[:-1, :])  # vertical edges (i, j)-(i+1, j)
+    rows_h, cols_h = np.mgrid[0:h, 0:w - 1]
+    rows_v, cols_v = np.mgrid[0:h - 1, 0:w]
+    px = np.concatenate([(cols_h + th).ravel(), cols_v.ravel().astype(float)])
+    py = np.concatenate([rows_h.ravel().astype(float), (rows_v + tv).ravel()])
+    return px, py
+
+
+def trace_rings(grid: np.ndarray, threshold: float) -> list[np.ndarray]:
+    """Closed iso-rings of grid >= threshold, each an (M, 2) array of (x, y) grid coordinates."""
+    grid = np.pad(grid, 1)  # zero border: every ring closes inside the grid
+    h, w = grid.shape
+    inside = grid >= threshold
+    case = (inside[:-1, :-1] * 8 + inside[:-1, 1:] * 4 + inside[1:, 1:] * 2 + inside[1:, :-1]).astype(np.int8)
+    ci, cj = np.nonzero((case > 0) & (case < 15))
+    if not len(ci):
+        return []
+    n_h = h * (w - 1)
+    centre = (grid[:-1, :-1] + grid[:-1, 1:] + grid[1:, 1:] + grid[1:, :-1]) / 4
+
+    # Edge ids per cell side: top/bottom are horizontal edges, left/right vertical.
+    side_ids = np.stack([ci * (w - 1) + cj, n_h + ci * w + cj + 1,
+                         (ci + 1) * (w - 1) + cj, n_h + ci * w + cj], axis=1)
+    seg_a, seg_b = [], []
+    for k, (i, j) in enumerate(zip(ci.tolist(), cj.tolist())):
+        c = int(case[i, j])
+        pairs = _SEGMENTS.get(c) or _SADDLES[c][0 if centre[i, j] >= threshold else 1]
+        for a, b in pairs:
+            seg_a.append(side_ids[k, a])
+            seg_b.append(side_ids[k, b])
+
+    # Each crossing point touches exactly two segments: walk them into rings.
+    neighbours: dict[int, list[int]] = {}
+    for a, b in zip(seg_a, seg_b):
+        neighbours.setdefault(a, []).append(b)
+        neighbours.setdefault(b, []).append(a)
+    px, py = _edge_points(grid, threshold)
+    rings, seen = [], set()
+    for start in neighbours:
+        if start in seen:
+            continue
+        ring, prev, cur = [start], None, start
+        seen.add(start)
+        while True:
+            a, b = neighbours[cur]
+            nxt = b if a == prev else a
+            if nxt == start or nxt in seen:
+                break
+            ring.append(nxt)
+            seen.add(nxt)
+            prev, cur = cur, nxt
+        ids = np.array(ring)
+        rings.append(np.stack([px[ids] - 1, py[ids] - 1], axis=1))  # undo the padding offset
+    return rings
+
+
+def contour_levels(coords: np.ndarray, levels=LEVELS, thresholds: int = THRESHOLDS) -> dict:
+    """Quantized contour geometry at every resolution level, in the padded UMAP extent."""
+    coords = np.asarray(coords, dtype=np.float64)
+    extent = padded_extent(coords)
+    out = {"extent": list(extent), "quant": QUANT, "levels": []}
+    for size, bandwidth in levels:
+        density = binned_kde(coords, extent, size, bandwidth)
+        peak = density.max()
+        contours = []
+        for step in range(1, thresholds + 1):
+            value = step / (thresholds + 1)
+            rings = trace_rings(density, value * peak) if peak > 0 else []
+            scale = QUANT / (size - 1)
+            contours.append({
+                "value": round(value, 4),
+                "rings": [np.rint(r * scale).astype(np.int32).ravel().tolist() for r in rings if len(r) >= 3],
+            })
+        out["levels"].append({"grid": size, "bandwidth": bandwidth, "contours": contours})
+    return out
+
+
+def save_contours(coords: np.ndarray, paths: list[Path]):
+    geometry = contour_levels(coords)
+    size = write_json(geometry, paths, compress=True)
+    print(f"Saved contour geometry ({size / 1024:.0f} KB) to {', '.join(str(p) for p in paths)}")
+    return geometry
@@ -3,85 +3,175 @@ Embedding generation for images (CLIP) or text (sentence-transformers).
 """
 import argparse
 import os
-import json
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from pathlib import Path
+import numpy as np
 from PIL import Image
 import torch
+from cache import EmbeddingCache
+from store import STORE_DTYPES, ShardWriter
+from scan import SCAN_WORKERS, ScannedFile, scan_files
+from preprocess import FastImagePreprocessor
+from dedup import DEDUP_RADIUS, HASH_METHODS, find_near_duplicates
+from backends import BACKENDS, apply_clip_backend, backend_cache_params, load_text_backend, set_threads
+from chunking import CHUNK_OVERLAP, POOLING_MODES, iter_chunk_texts, pool_chunks
 
 # Config
 OUTPUT_DIR = Path(__file__).parent.parent / "data"
 BATCH_SIZE = 32
+DECODE_WORKERS = min(4, os.cpu_count() or 1)
 MAX_ITEMS = 500
+CLIP_MODEL_ID = "openai/clip-vit-base-patch32"
+TEXT_MODEL_ID = "all-MiniLM-L6-v2"
+TEXT_MAX_CHARS = 8000
+TEXT_WINDOW = 2048  # files read and encoded together (bounds memory)
+SHARD_SIZE = 4096  # files per checkpointed output shard
+CHUNK_BUFFER = 4096  # chunk strings held before an encode() call in chunked mode
 IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.webp'}
 TEXT_EXTENSIONS = {'.md', '.txt', '.markdown'}
 
 
-def get_image_files(source_dir: Path, max_count: int = MAX_ITEMS) -> list[Path]:
-    """Get all image files from source directory."""
-    files = []
-    for f in source_dir.rglob("*"):
-        if f.suffix.lower() in IMAGE_EXTENSIONS and f.is_file():
-            files.append(f)
-            if len(files) >= max_count:
-                break
-    return sorted(files, key=lambda p: p.stat().st_mtime)
+def get_image_files(source_dir: Path, max_count: int = MAX_ITEMS, workers: int = SCAN_WORKERS,
+                    manifest_path: Path = None) -> list[ScannedFile]:
+    """Get the max_count newest image files under source directory (oldest first)."""
+    return scan_files(source_dir, IMAGE_EXTENSIONS, max_count, workers, manifest_path)
 
 
-def get_text_files(source_dir: Path, max_count: int = MAX_ITEMS) -> list[Path]:
-    """Get all text files from source directory recursively."""
-    files = []
-    for f in source_dir.rglob("*"):
-        if f.suffix.lower() in TEXT_EXTENSIONS and f.is_file():
-            files.append(f)
-            if len(files) >= max_count:
-                break
-    return sorted(files, key=lambda p: p.stat().st_mtime)
+def get_text_files(source_dir: Path, max_count: int = MAX_ITEMS, workers: int = SCAN_WORKERS,
+                   manifest_path: Path = None) -> list[ScannedFile]:
+    """Get the max_count newest text files under source directory recursively (oldest first)."""
+    return scan_files(source_dir, TEXT_EXTENSIONS, max_count, workers, manifest_path)
+
 
+def file_stat(path: Path, stats: dict = None):
+    """Stat from the scan if we have it, otherwise hit the filesystem."""
+    return stats[path] if stats and path in stats else path.stat()
 
-def load_clip_model():
+
+def load_clip_model(backend: str = "torch", threads: int = None):
     """Load CLIP model for images."""
     from transformers import CLIPProcessor, CLIPModel
     print("Loading CLIP model...")
-    model = CLIPModel.from_pretrained("openai/clip-vit-base-patch32")
-    processor = CLIPProcessor.from_pretrained("openai/clip-vit-base-patch32")
-    device = "mps" if torch.backends.mps.is_available() else "cuda" if torch.cuda.is_available() else "cpu"
-    model = model.to(device)
+    model = CLIPModel.from_pretrained(CLIP_MODEL_ID)
+    processor = CLIPProcessor.from_pretrained(CLIP_MODEL_ID)
+    set_threads(threads)
+    if backend == "torch":
+        device = "mps" if torch.backends.mps.is_available() else "cuda" if torch.cuda.is_available() else "cpu"
+        model = model.to(device)
+    else:
+        device = "cpu"
+        model = apply_clip_backend(model, CLIP_MODEL_ID, backend, threads)
     model.eval()
-    print(f"Model loaded on {device}")
+    print(f"Model loaded on {device} ({backend})")
     return model, processor, device
 
 
-def load_text_model():
+def load_text_model(backend: str = "torch", threads: int = None):
     """Load sentence-transformers model for text."""
-    from sentence_transformers import SentenceTransformer
     print("Loading text embedding model...")
     device = "mps" if torch.backends.mps.is_available() else "cuda" if torch.cuda.is_available() else "cpu"
-    model = SentenceTransformer("all-MiniLM-L6-v2", device=device)
-    print(f"Model loaded on {device}")
+    if backend != "torch":
+        device = "cpu"
+    model = load_text_backend(TEXT_MODEL_ID, device, backend, threads)
+    print(f"Model loaded on {device} ({backend})")
     return model, device
 
 
-def embed_images(model, processor, device, image_paths: list[Path]) -> list[dict]:
-    """Generate embeddings for all images."""
-    items = []
+def image_cache_params(processor, fast_preprocess: bool = False) -> dict:
+    """Preprocessing params that affect image embeddings (part of the cache key)."""
+    if fast_preprocess:
+        return {"kind": "image", **FastImagePreprocessor(processor).params()}
+    image_processor = getattr(processor, "image_processor", processor)
+    return {
+        "kind": "image",
+        "size": getattr(image_processor, "size", None),
+        "crop_size": getattr(image_processor, "crop_size", None),
+        "normalize": True,
+    }
+
+
+def split_cached(paths: list[Path], cache: EmbeddingCache, stats: dict = None) -> tuple[dict, dict, list[Path]]:
+    """Look up paths in the cache; return (keys, cached embeddings, paths still to encode)."""
+    keys, cached, todo = {}, {}, []
+    for path in paths:
+        try:
+            keys[path] = cache.key_for(path, file_stat(path, stats))
+        except OSError as e:
+            print(f"Skipping {path.name}: {e}")
+            continue
+        emb = cache.get(keys[path])
+        if emb is None:
+            todo.append(path)
+        else:
+            cached[path] = emb
+    print(f"{len(cached)} cached, {len(todo)} to encode")
+    return keys, cached, todo
+
+
+def load_image_batch(processor, batch_paths: list[Path]) -> tuple[list[Path], dict | None]:
+    """Decode and preprocess one batch; returns (paths that decoded, processor inputs)."""
+    images = []
+    valid_paths = []
     
-    for i in range(0, len(image_paths), BATCH_SIZE):
-        batch_paths = image_paths[i:i + BATCH_SIZE]
-        images = []
-        valid_paths = []
-        
-        for path in batch_paths:
-            try:
-                img = Image.open(path).convert("RGB")
-                images.append(img)
-                valid_paths.append(path)
-            except Exception as e:
-                print(f"Skipping {path.name}: {e}")
-        
-        if not images:
+    for path in batch_paths:
+        try:
+            img = Image.open(path).convert("RGB")
+            images.append(img)
+            valid_paths.append(path)
+        except Exception as e:
+            print(f"Skipping {path.name}: {e}")
+    
+    if not images:
+        return valid_paths, None
+    return valid_paths, processor(images=images, return_tensors="pt", padding=True)
+
+
+def iter_image_batches(load_batch, image_paths: list[Path], workers: int = DECODE_WORKERS):
+    """
+    Yield load_batch(batch_paths) results in order.
+    With workers > 0, a thread pool decodes up to `workers` batches ahead of the
+    consumer (bounded, so at most that many batches are held in memory).
+    """
+    batches = [image_paths[i:i + BATCH_SIZE] for i in range(0, len(image_paths), BATCH_SIZE)]
+    if workers <= 0:
+        for batch_paths in batches:
+            yield load_batch(batch_paths)
+        return
+    
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        batch_iter = iter(batches)
+        for batch_paths in batch_iter:
+            pending.append(pool.submit(load_batch, batch_paths))
+            if len(pending) >= workers:
+                break
+        while pending:
+            future = pending.popleft()
+            next_batch = next(batch_iter, None)
+            if next_batch is not None:
+                pending.append(pool.submit(load_batch, next_batch))
+            yield future.result()
+
+
+def embed_images(model, processor, device, image_paths: list[Path], cache: EmbeddingCache = None,
+                 workers: int = DECODE_WORKERS, stats: dict = None, fast_preprocess: bool = False) -> list[dict]:
+    """Generate embeddings for all images (only uncached ones hit the model)."""
+    keys, vectors, todo = {}, {}, image_paths
+    if cache is not None:
+        keys, vectors, todo = split_cached(image_paths, cache, stats)
+    load_batch = FastImagePreprocessor(processor) if fast_preprocess else partial(load_image_batch, processor)
+    
+    start = time.perf_counter()
+    done = 0
+    encoded = 0
+    for valid_paths, inputs in iter_image_batches(load_batch, todo, workers):
+        done = min(done + BATCH_SIZE, len(todo))
+        if inputs is None:
             continue
         
-        inputs = processor(images=images, return_tensors="pt", padding=True)
         inputs = {k: v.to(device) for k, v in inputs.items()}
         
         with torch.no_grad():
@@ -92,55 +182,216 @@ def embed_images(model, processor, device, image_paths: list[Path]) -> list[dict
         embeddings = embeddings / (embeddings ** 2).sum(axis=1, keepdims=True) ** 0.5
         
         for path, emb in zip(valid_paths, embeddings):
-            stat = path.stat()
+            vectors[path] = emb
+            if cache is not None:
+                cache.put(keys[path], emb)
+        encoded += len(valid_paths)
+        
+        rate = encoded / max(time.perf_counter() - start, 1e-9)
+        print(f"Processed {done}/{len(todo)} images ({rate:.1f} img/s)")
+    
+    if encoded:
+        elapsed = time.perf_counter() - start
+        print(f"Encoded {encoded} images in {elapsed:.1f}s "
+              f"({encoded / max(elapsed, 1e-9):.1f} img/s, {workers} decode workers)")
+    
+    items = []
+    for path in image_paths:
+        emb = vectors.get(path)
+        if emb is None:
+            continue
+        stat = file_stat(path, stats)
+        items.append({
+            "id": path.stem[:50],
+            "type": "image",
+            "content": str(path),
+            "timestamp": int(stat.st_mtime),
+            "embedding": emb
+        })
+    
+    return items
+
+
+def read_text_head(path: Path, max_chars: int) -> str:
+    """Read at most max_chars characters without loading the whole file."""
+    with open(path, encoding="utf-8", errors="ignore") as f:
+        return f.read(max_chars)
+
+
+def embed_texts(model, device, text_paths: list[Path], max_chars: int = TEXT_MAX_CHARS,
+                cache: EmbeddingCache = None, stats: dict = None) -> list[dict]:
+    """
+    Generate embeddings for all text files (only uncached ones hit the model).
+    Files are streamed in windows of TEXT_WINDOW; each window goes to the model as
+    one encode() call, which length-sorts it into BATCH_SIZE buckets internally.
+    """
+    items = []
+    start = time.perf_counter()
+    encoded = 0
+    
+    for w in range(0, len(text_paths), TEXT_WINDOW):
+        records = []
+        for path in text_paths[w:w + TEXT_WINDOW]:
+            try:
+                content = read_text_head(path, max_chars)
+                stat = file_stat(path, stats)
+            except Exception as e:
+                print(f"Skipping {path.name}: {e}")
+                continue
+            
+            if not content.strip():
+                continue
+            
+            key = cache.key_for(path, stat) if cache is not None else None
+            emb = cache.get(key) if cache is not None else None
+            records.append({"path": path, "stat": stat, "content": content, "key": key, "embedding": emb})
+        
+        todo = [r for r in records if r["embedding"] is None]
+        if todo:
+            embeddings = model.encode(
+                [r["content"] for r in todo],
+                batch_size=BATCH_SIZE,
+                normalize_embeddings=True,
+                show_progress_bar=False,
+            )
+            for r, emb in zip(todo, embeddings):
+                r["embedding"] = emb
+                if cache is not None:
+                    cache.put(r["key"], emb)
+            encoded += len(todo)
+        
+        for r in records:
+            path, content = r["path"], r["content"]
             items.append({
                 "id": path.stem[:50],
-                "type": "image",
+                "type": "text",
                 "content": str(path),
-                "timestamp": int(stat.st_mtime),
-                "embedding": emb.tolist()
+                "preview": content[:200],
+                "full_text": content[:4000],  # Limit to avoid stack overflow in browser
+                "timestamp": int(r["stat"].st_mtime),
+                "embedding": r["embedding"]
             })
         
-        print(f"Processed {min(i + BATCH_SIZE, len(image_paths))}/{len(image_paths)} images")
+        print(f"Processed {min(w + TEXT_WINDOW, len(text_paths))}/{len(text_paths)} text files")
+    
+    if encoded:
+        elapsed = time.perf_counter() - start
+        print(f"Encoded {encoded} text files in {elapsed:.1f}s ({encoded / max(elapsed, 1e-9):.1f} docs/s)")
     
     return items
 
 
-def embed_texts(model, device, text_paths: list[Path], max_chars: int = 8000) -> list[dict]:
-    """Generate embeddings for all text files."""
+def encode_chunk_buffer(model, buffer: list[tuple[dict, str]]):
+    """Encode buffered (record, chunk text) pairs and attach vectors to their records."""
+    vectors = model.encode(
+        [text for _, text in buffer],
+        batch_size=BATCH_SIZE,
+        normalize_embeddings=True,
+        show_progress_bar=False,
+    )
+    for (record, _), vec in zip(buffer, vectors):
+        record["chunks"].append(np.asarray(vec, dtype=np.float32))
+    buffer.clear()
+
+
+def embed_texts_chunked(model, device, text_paths: list[Path], overlap: int = CHUNK_OVERLAP,
+                        pooling: str = "mean", keep_chunks: bool = False,
+                        cache: EmbeddingCache = None, stats: dict = None) -> tuple[list[dict], np.ndarray | None]:
+    """
+    Embed whole documents as overlapping token windows pooled into one vector.
+    Chunk text is buffered at most CHUNK_BUFFER at a time; only chunk vectors are
+    kept per document until it is pooled. With keep_chunks, every chunk vector is
+    returned as an (n_chunks, dim) matrix and items get chunk_offset/chunk_count.
+    """
+    window = model.max_seq_length - 2  # room for [CLS]/[SEP]
     items = []
+    kept = []
+    n_kept = 0
+    start = time.perf_counter()
+    encoded = 0
     
-    for i, path in enumerate(text_paths):
-        try:
-            content = path.read_text(encoding="utf-8", errors="ignore")[:max_chars]
-        except Exception as e:
-            print(f"Skipping {path.name}: {e}")
-            continue
-        
-        if not content.strip():
-            continue
+    for w in range(0, len(text_paths), TEXT_WINDOW):
+        records = []
+        buffer = []
+        for path in text_paths[w:w + TEXT_WINDOW]:
+            try:
+                head = read_text_head(path, 4000)
+                stat = file_stat(path, stats)
+            except Exception as e:
+                print(f"Skipping {path.name}: {e}")
+                continue
+            
+            if not head.strip():
+                continue
+            
+            key = cache.key_for(path, stat) if cache is not None else None
+            emb = None
+            if cache is not None and keep_chunks:
+                # Cached doc vectors carry no chunk vectors, so keep_chunks always
+                # re-encodes; count that as a miss so the cache report stays right.
+                cache.misses += 1
+            elif cache is not None:
+                emb = cache.get(key)
+            record = {"path": path, "stat": stat, "content": head, "key": key, "embedding": emb, "chunks": []}
+            records.append(record)
+            if emb is not None:
+                continue
+            
+            try:
+                for chunk in iter_chunk_texts(path, model.tokenizer, window, overlap):
+                    buffer.append((record, chunk))
+                    if len(buffer) >= CHUNK_BUFFER:
+                        encode_chunk_buffer(model, buffer)
+            except Exception as e:
+                print(f"Skipping {path.name}: {e}")
+                buffer[:] = [(r, t) for r, t in buffer if r is not record]
+                record["chunks"] = None
         
-        # Get embedding
-        emb = model.encode(content, normalize_embeddings=True)
+        if buffer:
+            encode_chunk_buffer(model, buffer)
         
-        stat = path.stat()
-        items.append({
-            "id": path.stem[:50],
-            "type": "text",
-            "content": str(path),
-            "preview": content[:200],
-            "full_text": content[:4000],  # Limit to avoid stack overflow in browser
-            "timestamp": int(stat.st_mtime),
-            "embedding": emb.tolist()
-        })
+        for r in records:
+            if r["embedding"] is None:
+                if not r["chunks"]:
+                    continue
+                chunks = np.stack(r["chunks"])
+                r["embedding"] = pool_chunks(chunks, pooling)
+                if cache is not None:
+                    cache.put(r["key"], r["embedding"])
+                encoded += 1
+            
+            path, content = r["path"], r["content"]
+            item = {
+                "id": path.stem[:50],
+                "type": "text",
+                "content": str(path),
+                "preview": content[:200],
+                "full_text": content[:4000],  # Limit to avoid stack overflow in browser
+                "timestamp": int(r["stat"].st_mtime),
+                "embedding": r["embedding"]
+            }
+            if keep_chunks:
+                item["chunk_offset"] = n_kept
+                item["chunk_count"] = len(chunks)
+                kept.append(chunks)
+                n_kept += len(chunks)
+            items.append(item)
         
-        if (i + 1) % 50 == 0 or i == len(text_paths) - 1:
-            print(f"Processed {i + 1}/{len(text_paths)} text files")
+        print(f"Processed {min(w + TEXT_WINDOW, len(text_paths))}/{len(text_paths)} text files")
     
-    return items
+    if encoded:
+        elapsed = time.perf_counter() - start
+        print(f"Encoded {encoded} documents in {elapsed:.1f}s ({encoded / max(elapsed, 1e-9):.1f} docs/s)")
+    
+    chunk_matrix = np.concatenate(kept) if kept else None
+    return items, chunk_matrix
 
 
-def main(mode: str = "image", source_dir: str = None, max_items: int = MAX_ITEMS):
+def main(mode: str = "image", source_dir: str = None, max_items: int = MAX_ITEMS, use_cache: bool = True,
+         workers: int = DECODE_WORKERS, chunk: bool = False, pooling: str = "mean", keep_chunks: bool = False,
+         dtype: str = "float32", scan_workers: int = SCAN_WORKERS, scan_manifest: bool = False,
+         fast_preprocess: bool = False, backend: str = "torch", threads: int = None,
+         resume: bool = False, dedup: bool = False, dedup_radius: int = DEDUP_RADIUS, hash_method: str = "dhash"):
     OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
     
     if source_dir is None:
@@ -153,22 +404,72 @@ def main(mode: str = "image", source_dir: str = None, max_items: int = MAX_ITEMS
     print(f"Mode: {mode}")
     print(f"Scanning {source_path}...")
     
+    manifest_path = OUTPUT_DIR / "cache" / f"scan_{mode}.json" if scan_manifest else None
+    get_files = get_image_files if mode == "image" else get_text_files
+    scanned = get_files(source_path, max_items, scan_workers, manifest_path)
+    files = [f.path for f in scanned]
+    # Manifest listings can carry a stale size/mtime for files edited in place, and the
+    # content cache and hash memo trust size/mtime, so re-stat the selected files instead.
+    stats = {f.path: f for f in scanned} if manifest_path is None else None
+    
+    duplicates = {}
+    if dedup and mode == "image":
+        memo_path = OUTPUT_DIR / "cache" / f"{hash_method}.json"
+        files, duplicates = find_near_duplicates(files, dedup_radius, hash_method, stats=stats, memo_path=memo_path)
+        folded = sum(len(v) for v in duplicates.values())
+        print(f"Near-duplicates: {folded} images folded into {len(duplicates)} representatives")
+    
+    writer = ShardWriter(mode, resume=resume, data_dir=OUTPUT_DIR)
+    done = writer.done_inputs()
+    todo = [p for p in files if str(p) not in done]
+    print(f"Found {len(files)} {'images' if mode == 'image' else 'text files'}"
+          + (f", {len(files) - len(todo)} already done (resuming)" if done else ""))
+    
     if mode == "image":
-        files = get_image_files(source_path, max_items)
-        print(f"Found {len(files)} images")
-        model, processor, device = load_clip_model()
-        items = embed_images(model, processor, device, files)
+        model, processor, device = load_clip_model(backend, threads)
+        params = {**image_cache_params(processor, fast_preprocess), **backend_cache_params(backend)}
+        cache = EmbeddingCache(CLIP_MODEL_ID, params) if use_cache else None
+        
+        def encode(segment):
+            items = embed_images(model, processor, device, segment, cache=cache, workers=workers, stats=stats,
+                                 fast_preprocess=fast_preprocess)
+            for item in items:
+                dups = duplicates.get(Path(item["content"]))
+                if dups:
+                    item["duplicates"] = [str(p) for p in dups]
+            return items, None
     else:
-        files = get_text_files(source_path, max_items)
-        print(f"Found {len(files)} text files")
-        model, device = load_text_model()
-        items = embed_texts(model, device, files)
+        model, device = load_text_model(backend, threads)
+        if chunk:
+            params = {"kind": "text", "chunked": True, "window": model.max_seq_length - 2,
+                      "overlap": CHUNK_OVERLAP, "pooling": pooling, **backend_cache_params(backend)}
+            cache = EmbeddingCache(TEXT_MODEL_ID, params) if use_cache else None
+            
+            def encode(segment):
+                return embed_texts_chunked(model, device, segment, pooling=pooling,
+                                           keep_chunks=keep_chunks, cache=cache, stats=stats)
+        else:
+            params = {"kind": "text", "max_chars": TEXT_MAX_CHARS, **backend_cache_params(backend)}
+            cache = EmbeddingCache(TEXT_MODEL_ID, params) if use_cache else None
+            
+            def encode(segment):
+                return embed_texts(model, device, segment, cache=cache, stats=stats), None
+    
+    # Encode in shards: each finished segment is flushed to disk (and the cache
+    # checkpointed), so memory stays flat and --resume can skip it after a crash.
+    for i in range(0, len(todo), SHARD_SIZE):
+        segment = todo[i:i + SHARD_SIZE]
+        items, chunk_vectors = encode(segment)
+        writer.write(items, [str(p) for p in segment], chunk_vectors)
+        if cache is not None:
+            cache.save()
+        print(f"Checkpointed {min(i + SHARD_SIZE, len(todo))}/{len(todo)} ({len(writer.entries)} shards)")
     
-    output_path = OUTPUT_DIR / f"embeddings_raw_{mode}.json"
-    with open(output_path, "w") as f:
-        json.dump({"items": items, "mode": mode}, f)
+    if cache is not None:
+        print(cache.report())
     
-    print(f"Saved {len(items)} embeddings to {output_path}")
+    items, output_path = writer.finalize([str(p) for p in files], dtype=dtype)
+    print(f"Saved {len(items)} embeddings to {output_path} ({dtype})")
     return items
 
 
@@ -178,6 +479,37 @@ if __name__ == "__main__":
                         help="Embedding mode: image or text")
     parser.add_argument("--input", type=str, help="Source directory path")
     parser.add_argument("--max", type=int, default=MAX_ITEMS, help="Max items to process")
+    parser.add_argument("--no-cache", action="store_true", help="Re-encode everything, ignoring the embedding cache")
+    parser.add_argument("--workers", type=int, default=DECODE_WORKERS,
+                        help="Image decode/preprocess threads running ahead of inference (0 = serial)")
+    parser.add_argument("--chunk", action="store_true",
+                        help="Text mode: embed whole documents as pooled overlapping token windows")
+    parser.add_argument("--pooling", choices=POOLING_MODES, default="mean",
+                        help="How chunk vectors are pooled into a document vector")
+    parser.add_argument("--keep-chunks", action="store_true",
+                        help="Also save per-chunk vectors to data/chunks_text.npy")
+    parser.add_argument("--dtype", choices=STORE_DTYPES, default="float32",
+                        help="Storage precision of the embedding matrix")
+    parser.add_argument("--scan-workers", type=int, default=SCAN_WORKERS,
+                        help="Threads listing directories in parallel")
+    parser.add_argument("--scan-manifest", action="store_true",
+                        help="Persist a directory manifest and skip re-listing unchanged directories")
+    parser.add_argument("--fast-preprocess", action="store_true",
+                        help="Image mode: draft-mode JPEG decode + batched normalize instead of CLIPProcessor")
+    parser.add_argument("--backend", choices=BACKENDS, default="torch",
+                        help="Encoder backend: fp32 torch, int8 dynamic-quantized torch, or ONNX Runtime (CPU)")
+    parser.add_argument("--threads", type=int, help="Intra-op threads for CPU inference")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue an interrupted run, skipping inputs already in completed shards")
+    parser.add_argument("--dedup", action="store_true",
+                        help="Image mode: embed one representative per near-duplicate group (perceptual hash)")
+    parser.add_argument("--dedup-radius", type=int, default=DEDUP_RADIUS,
+                        help="Max Hamming distance (of 64 bits) for two images to count as near-duplicates")
+    parser.add_argument("--hash", choices=HASH_METHODS, default="dhash", help="Perceptual hash for --dedup")
     
     args = parser.parse_args()
-    main(mode=args.mode, source_dir=args.input, max_items=args.max)
+    main(mode=args.mode, source_dir=args.input, max_items=args.max, use_cache=not args.no_cache,
+         workers=args.workers, chunk=args.chunk, pooling=args.pooling, keep_chunks=args.keep_chunks,
+         dtype=args.dtype, scan_workers=args.scan_workers, scan_manifest=args.scan_manifest,
+         fast_preprocess=args.fast_preprocess, backend=args.backend, threads=args.threads,
+         resume=args.resume, dedup=args.dedup, dedup_radius=args.dedup_radius, hash_method=args.hash)
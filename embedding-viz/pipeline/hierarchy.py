@@ -0,0 +1,181 @@
+"""
+Persisted HDBSCAN hierarchy for fast re-cuts.
+
+After each full fit the single-linkage tree (and the condensed tree it produced) are
+saved in data/cache/hierarchy_{mode}.npz. min_samples shapes the single-linkage tree,
+but min_cluster_size and cluster_selection_epsilon only affect how it is condensed
+and cut, so new flat clusterings for those take milliseconds and need no refit.
+The condense / excess-of-mass / labelling steps are done here in NumPy rather than
+through hdbscan's private helpers, so re-cuts don't depend on hdbscan internals.
+"""
+from pathlib import Path
+import numpy as np
+
+CACHE_DIR = Path(__file__).parent.parent / "data" / "cache"
+
+
+def hierarchy_path(mode: str) -> Path:
+    return CACHE_DIR / f"hierarchy_{mode}.npz"
+
+
+def save_hierarchy(mode: str, clusterer, keys: list[str]):
+    """Store the fitted trees with the item keys (row order) they were built on."""
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    path = hierarchy_path(mode)
+    tmp = path.with_suffix(".tmp.npz")
+    np.savez(
+        tmp,
+        single_linkage=clusterer.single_linkage_tree_.to_numpy(),
+        condensed=clusterer.condensed_tree_.to_numpy(),
+        keys=np.array(keys, dtype=str),
+        min_cluster_size=clusterer.min_cluster_size,
+        min_samples=clusterer.min_samples,
+    )
+    tmp.replace(path)
+
+
+def load_hierarchy(mode: str) -> dict | None:
+    path = hierarchy_path(mode)
+    if not path.exists():
+        return None
+    with np.load(path) as f:
+        return {name: f[name] for name in f.files}
+
+
+def _leaves(single_linkage: np.ndarray, node: int, n: int) -> list[int]:
+    """Data points under a single-linkage node."""
+    out, stack = [], [node]
+    while stack:
+        node = stack.pop()
+        if node < n:
+            out.append(node)
+        else:
+            left, right = single_linkage[node - n, :2].astype(np.int64)
+            stack.extend((left, right))
+    return out
+
+
+def condense_tree(single_linkage: np.ndarray, min_cluster_size: int) -> np.ndarray:
+    """
+    Condensed tree rows (parent, child, lambda, child size), as HDBSCAN builds it:
+    a split is kept only when both sides have min_cluster_size points; otherwise the
+    smaller side's points fall out of the surviving cluster at that lambda.
+    Clusters are numbered from n (the root) in creation order.
+    """
+    n = len(single_linkage) + 1
+    sizes = np.concatenate([np.ones(n), single_linkage[:, 3]])
+    relabel = {2 * n - 2: n}
+    next_label = n + 1
+    rows = []
+    queue = [2 * n - 2]
+    for node in queue:
+        left, right = single_linkage[node - n, :2].astype(np.int64)
+        dist = single_linkage[node - n, 2]
+        lam = 1.0 / dist if dist > 0 else np.inf
+        parent = relabel[node]
+        big = [c for c in (left, right) if sizes[c] >= min_cluster_size]
+        if len(big) == 2:
+            for child in (left, right):
+                relabel[child] = next_label
+                rows.append((parent, next_label, lam, sizes[child]))
+                next_label += 1
+                if child >= n:
+                    queue.append(child)
+            continue
+        for child in (left, right):
+            if len(big) == 1 and child == big[0]:
+                relabel[child] = parent
+                if child >= n:
+                    queue.append(child)
+            else:
+                rows.extend((parent, p, lam, 1) for p in _leaves(single_linkage, child, n))
+    return np.array(rows, dtype=np.float64).reshape(-1, 4)
+
+
+def select_clusters(condensed: np.ndarray, epsilon: float = 0.0) -> set[int]:
+    """Excess-of-mass cluster selection (root excluded), then cluster_selection_epsilon merging."""
+    parents, children = condensed[:, 0].astype(np.int64), condensed[:, 1].astype(np.int64)
+    lambdas, sizes = condensed[:, 2], condensed[:, 3]
+    root = int(parents.min())
+    is_cluster_row = sizes > 1
+    birth = {root: 0.0}
+    birth.update(zip(children[is_cluster_row].tolist(), lambdas[is_cluster_row].tolist()))
+    parent_of = dict(zip(children[is_cluster_row].tolist(), parents[is_cluster_row].tolist()))
+    kids: dict[int, list[int]] = {}
+    for c, p in parent_of.items():
+        kids.setdefault(p, []).append(c)
+    
+    stability = dict.fromkeys(birth, 0.0)
+    excess = (lambdas - np.array([birth[p] for p in parents.tolist()])) * sizes
+    for p, e in zip(parents.tolist(), excess.tolist()):
+        stability[p] += e
+    
+    def descendants(node):
+        stack, out = list(kids.get(node, ())), []
+        while stack:
+            c = stack.pop()
+            out.append(c)
+            stack.extend(kids.get(c, ()))
+        return out
+    
+    selected = {c: True for c in birth if c != root}
+    for node in sorted(selected, reverse=True):
+        subtree = sum(stability[c] for c in kids.get(node, ()))
+        if subtree > stability[node]:
+            selected[node] = False
+            stability[node] = subtree
+        else:
+            for c in descendants(node):
+                selected[c] = False
+    chosen = {c for c, keep in selected.items() if keep}
+    
+    if epsilon and parent_of:
+        merged, processed = set(), set()
+        for leaf in sorted(chosen):
+            if 1.0 / birth[leaf] >= epsilon:
+                merged.add(leaf)
+            elif leaf not in processed:
+                node = leaf
+                while parent_of[node] != root and 1.0 / birth[parent_of[node]] <= epsilon:
+                    node = parent_of[node]
+                if parent_of[node] != root:
+                    node = parent_of[node]
+                merged.add(node)
+                processed.update(descendants(node))
+        chosen = merged
+    return chosen
+
+
+def recut_labels(single_linkage: np.ndarray, min_cluster_size: int, epsilon: float = 0.0) -> np.ndarray:
+    """Flat labels (-1 = noise) from the saved single-linkage tree."""
+    n = len(single_linkage) + 1
+    if n < 2:
+        return np.full(n, -1, dtype=np.int64)
+    condensed = condense_tree(single_linkage, min_cluster_size)
+    chosen = select_clusters(condensed, epsilon) if len(condensed) else set()
+    
+    # Each condensed cluster inherits its nearest selected ancestor (ids grow away from the root).
+    owner = {n: -1}
+    label_of = {c: i for i, c in enumerate(sorted(chosen))}
+    for p, c, _, _ in sorted(condensed[condensed[:, 3] > 1].tolist(), key=lambda r: r[1]):
+        owner[int(c)] = label_of[int(c)] if int(c) in label_of else owner[int(p)]
+    
+    labels = np.full(n, -1, dtype=np.int64)
+    points = condensed[condensed[:, 3] == 1]
+    point_ids = points[:, 1].astype(np.int64)
+    labels[point_ids] = [owner[int(p)] for p in points[:, 0].tolist()]
+    return labels
+
+
+def membership_keys(labels: np.ndarray) -> dict[int, bytes]:
+    """{cluster id: sorted member indices as bytes}, for comparing memberships across cuts."""
+    members = np.flatnonzero(labels >= 0)
+    order = members[np.argsort(labels[members], kind="stable")]
+    ids, starts = np.unique(labels[order], return_index=True)
+    return {int(c): part.tobytes() for c, part in zip(ids, np.split(order, starts[1:]))}
+
+
+def unchanged_labels(old_labels: np.ndarray, old_names: dict[int, str], new_labels: np.ndarray) -> dict[int, str]:
+    """{new cluster id: existing label} for clusters whose membership is exactly unchanged."""
+    old_by_members = {m: old_names[c] for c, m in membership_keys(old_labels).items() if c in old_names}
+    return {c: old_by_members[m] for c, m in membership_keys(new_labels).items() if m in old_by_members}
@@ -0,0 +1,108 @@
+"""
+Persisted UMAP/HDBSCAN models for incremental map updates.
+
+After a full fit, the UMAP reducer, the HDBSCAN clusterer (built with
+prediction_data=True) and every placed item's coords/label are pickled. On later
+runs, known items keep their position, new items are placed with
+reducer.transform + hdbscan.approximate_predict, and a full refit runs only once
+new-item volume or noise drift passes a threshold.
+"""
+import pickle
+from pathlib import Path
+import numpy as np
+import hdbscan
+from reduction import apply_reduction
+
+MODEL_DIR = Path(__file__).parent.parent / "data" / "cache"
+REFIT_FRACTION = 0.2  # refit once items added since the last fit exceed this share of the fitted set
+NOISE_DRIFT = 0.5  # refit if more than this share of a batch of new items lands in noise
+MIN_DRIFT_BATCH = 20  # don't judge noise drift on fewer new items than this
+
+
+def state_path(mode: str) -> Path:
+    return MODEL_DIR / f"layout_{mode}.pkl"
+
+
+def load_state(mode: str) -> dict | None:
+    path = state_path(mode)
+    if not path.exists():
+        return None
+    try:
+        with open(path, "rb") as f:
+            return pickle.load(f)
+    except Exception as e:
+        print(f"Ignoring unreadable layout state {path}: {e}")
+        return None
+
+
+def save_state(mode: str, state: dict):
+    MODEL_DIR.mkdir(parents=True, exist_ok=True)
+    path = state_path(mode)
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "wb") as f:
+        pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+    tmp.replace(path)
+
+
+def clear_state(mode: str) -> bool:
+    """Drop the saved models (e.g. after a re-cut they no longer match); True if there were any."""
+    path = state_path(mode)
+    if not path.exists():
+        return False
+    path.unlink()
+    return True
+
+
+def new_state(reducer, clusterer, keys: list[str], coords: np.ndarray, labels: np.ndarray,
+              projection=None, reduction: tuple = ("none", None)) -> dict:
+    """State right after a full fit: every item is part of the fitted set."""
+    return {
+        "reduction": reduction,
+        "projection": projection,
+        "reducer": reducer,
+        "clusterer": clusterer,
+        "keys": list(keys),
+        "coords": np.asarray(coords, dtype=np.float32),
+        "labels": np.asarray(labels, dtype=np.int32),
+        "fitted": np.ones(len(keys), dtype=bool),
+    }
+
+
+def update_layout(state: dict, embeddings: np.ndarray, keys: list[str],
+                  refit_fraction: float = REFIT_FRACTION,
+                  noise_drift: float = NOISE_DRIFT) -> tuple[np.ndarray, np.ndarray, dict] | None:
+    """
+    Place `keys` using the persisted models. Returns (coords, labels, updated state),
+    or None when a full refit is due.
+    """
+    index = {k: i for i, k in enumerate(state["keys"])}
+    rows = np.array([index.get(k, -1) for k in keys], dtype=np.int64)
+    new = np.flatnonzero(rows < 0)
+    known = np.flatnonzero(rows >= 0)
+
+    n_fitted = int(state["fitted"].sum())
+    n_unfitted = len(new) + int((~state["fitted"][rows[known]]).sum())
+    if n_fitted == 0 or n_unfitted > refit_fraction * n_fitted:
+        print(f"{n_unfitted} items added since the last fit (> {refit_fraction:.0%} of {n_fitted}); refitting")
+        return None
+
+    coords = np.zeros((len(keys), 2), dtype=np.float32)
+    labels = np.full(len(keys), -1, dtype=np.int32)
+    coords[known] = state["coords"][rows[known]]
+    labels[known] = state["labels"][rows[known]]
+    fitted = np.zeros(len(keys), dtype=bool)
+    fitted[known] = state["fitted"][rows[known]]
+
+    if len(new):
+        new_embeddings = apply_reduction(state.get("projection"), np.asarray(embeddings[new], dtype=np.float32))
+        coords[new] = state["reducer"].transform(new_embeddings)
+        new_labels, _ = hdbscan.approximate_predict(state["clusterer"], coords[new])
+        labels[new] = new_labels
+        noise = float((new_labels == -1).mean())
+        if len(new) >= MIN_DRIFT_BATCH and noise > noise_drift:
+            print(f"{noise:.0%} of {len(new)} new items fell into noise (> {noise_drift:.0%}); refitting")
+            return None
+    print(f"Incremental layout: {len(known)} kept, {len(new)} placed")
+
+    state = {**state, "keys": list(keys), "coords": coords, "labels": labels, "fitted": fitted}
+    return coords, labels, state
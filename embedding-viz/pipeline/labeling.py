@@ -0,0 +1,148 @@
+"""
+Cluster labeling in embedding space.
+
+Image clusters: the zero-shot prompt vocabulary is encoded once (and cached on disk),
+then every cluster is scored in one matrix multiply of per-cluster centroids (or
+medoids) from the stored CLIP embeddings against the prompt embeddings. No images
+are re-opened.
+
+Text clusters: every document is tokenized once into a sparse term-count matrix,
+summed per cluster with one sparse product, and scored with class-based TF-IDF
+(term frequency within the cluster x log(1 + avg words per cluster / corpus term
+frequency)), so labels are terms that separate a cluster from the others.
+"""
+import hashlib
+import json
+from pathlib import Path
+import numpy as np
+from scipy import sparse
+
+CACHE_DIR = Path(__file__).parent.parent / "data" / "cache"
+LABEL_MODEL_ID = "openai/clip-vit-base-patch32"  # must match the model that produced the image embeddings
+PROMPT_TEMPLATE = "a photo of {}"
+REPRESENTATIVES = ("centroid", "medoid")
+TOP_TERMS = 5
+TEXT_STOPWORDS = {
+    'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for',
+    'of', 'with', 'by', 'from', 'is', 'are', 'was', 'were', 'be', 'been',
+    'being', 'have', 'has', 'had', 'do', 'does', 'did', 'will', 'would',
+    'could', 'should', 'may', 'might', 'must', 'shall', 'can', 'this',
+    'that', 'these', 'those', 'i', 'you', 'he', 'she', 'it', 'we', 'they',
+    'what', 'which', 'who', 'when', 'where', 'why', 'how', 'all', 'each',
+    'every', 'both', 'few', 'more', 'most', 'other', 'some', 'such', 'no',
+    'not', 'only', 'same', 'so', 'than', 'too', 'very', 'just', 'also',
+    'now', 'here', 'there', 'then', 'if', 'as', 'because', 'until', 'while',
+    'about', 'into', 'through', 'during', 'before', 'after', 'above', 'below'
+}
+
+
+def encode_label_prompts(labels: list[str], model_id: str = LABEL_MODEL_ID) -> np.ndarray:
+    """Normalized CLIP text embeddings for the prompt vocabulary, cached per (model, prompts)."""
+    key = hashlib.blake2b(json.dumps([model_id, PROMPT_TEMPLATE, labels]).encode(), digest_size=8).hexdigest()
+    path = CACHE_DIR / f"label_prompts_{key}.npy"
+    if path.exists():
+        return np.load(path)
+
+    import torch  # lazy import (optional dep)
+    from transformers import CLIPModel, CLIPProcessor
+    print(f"Encoding {len(labels)} label prompts with {model_id}...")
+    model = CLIPModel.from_pretrained(model_id).eval()
+    processor = CLIPProcessor.from_pretrained(model_id)
+    inputs = processor(text=[PROMPT_TEMPLATE.format(label) for label in labels], return_tensors="pt", padding=True)
+    with torch.no_grad():
+        features = model.get_text_features(**inputs).cpu().numpy().astype(np.float32)
+    features /= np.linalg.norm(features, axis=1, keepdims=True)
+
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    np.save(path, features)
+    return features
+
+
+def cluster_representatives(embeddings: np.ndarray, labels: np.ndarray,
+                            method: str = "centroid") -> tuple[np.ndarray, np.ndarray]:
+    """
+    One vector per cluster (noise excluded): mean embedding, or the member closest to it.
+    Returns (cluster_ids, (K, D) representatives).
+    """
+    members = np.flatnonzero(labels >= 0)
+    cluster_ids, group = np.unique(labels[members], return_inverse=True)
+    if not len(cluster_ids):
+        return cluster_ids, np.zeros((0, embeddings.shape[1]), dtype=np.float32)
+
+    # Sparse (K, N) membership matrix: one product gives every cluster's sum.
+    membership = sparse.csr_matrix(
+        (np.ones(len(members), dtype=np.float32), (group, members)),
+        shape=(len(cluster_ids), len(embeddings)),
+    )
+    counts = np.bincount(group).astype(np.float32)
+    centroids = np.asarray(membership @ embeddings, dtype=np.float32) / counts[:, None]
+    if method != "medoid":
+        return cluster_ids, centroids
+
+    # Medoid: per cluster, the member with the highest similarity to the centroid.
+    sims = np.einsum("ij,ij->i", embeddings[members], centroids[group])
+    order = np.lexsort((-sims, group))
+    _, first = np.unique(group[order], return_index=True)
+    return cluster_ids, np.asarray(embeddings[members[order[first]]], dtype=np.float32)
+
+
+def label_clusters_by_embedding(embeddings: np.ndarray, labels: np.ndarray, vocabulary: list[str],
+                                prompt_features: np.ndarray, method: str = "centroid") -> dict[int, str]:
+    """
+    Best vocabulary entry per cluster. With centroids, the score equals the mean
+    prompt similarity over all members (the old per-image average, without sampling).
+    """
+    cluster_ids, reps = cluster_representatives(embeddings, labels, method)
+    if not len(cluster_ids):
+        return {}
+    best = (reps @ prompt_features.T).argmax(axis=1)
+    # Single-label clusters only (no "X/Y" compound titles).
+    return {int(c): vocabulary[b].title() for c, b in zip(cluster_ids, best)}
+
+
+def membership_matrix(labels: np.ndarray) -> tuple[np.ndarray, sparse.csr_matrix]:
+    """(class ids, sparse (K, N) 0/1 matrix); noise (-1) is kept as its own class."""
+    class_ids, group = np.unique(labels, return_inverse=True)
+    membership = sparse.csr_matrix(
+        (np.ones(len(labels), dtype=np.float32), (group, np.arange(len(labels)))),
+        shape=(len(class_ids), len(labels)),
+    )
+    return class_ids, membership
+
+
+def class_tfidf_terms(texts: list[str], labels: np.ndarray, top_n: int = TOP_TERMS) -> dict[int, list[str]]:
+    """
+    Top distinctive terms per cluster (noise excluded) by class-based TF-IDF.
+    Documents are tokenized once; all clusters are scored in one sparse pass.
+    """
+    from sklearn.feature_extraction.text import CountVectorizer
+    vectorizer = CountVectorizer(
+        lowercase=True,
+        token_pattern=r"(?u)\b[a-zA-Z]{4,}\b",  # alphabetic words longer than 3 chars
+        stop_words=list(TEXT_STOPWORDS),
+        min_df=2 if len(texts) >= 100 else 1,  # drop hapaxes on real corpora
+        dtype=np.float32,
+    )
+    try:
+        counts = vectorizer.fit_transform(texts)
+    except ValueError:  # empty vocabulary
+        return {}
+    vocab = vectorizer.get_feature_names_out()
+
+    class_ids, membership = membership_matrix(labels)
+    class_counts = (membership @ counts).tocsr()  # (K, V) term counts per class
+    words_per_class = np.asarray(class_counts.sum(axis=1)).ravel()
+    term_freq = np.asarray(class_counts.sum(axis=0)).ravel()
+    idf = np.log1p(words_per_class.mean() / np.maximum(term_freq, 1))
+    tf = sparse.diags(1 / np.maximum(words_per_class, 1)) @ class_counts
+    scores = (tf @ sparse.diags(idf)).tocsr()
+
+    terms = {}
+    for row, cid in enumerate(class_ids):
+        if cid < 0:
+            continue
+        start, end = scores.indptr[row], scores.indptr[row + 1]
+        data, cols = scores.data[start:end], scores.indices[start:end]
+        top = np.argsort(-data, kind="stable")[:top_n]
+        terms[int(cid)] = vocab[cols[top]].tolist()
+    return terms
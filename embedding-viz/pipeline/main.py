@@ -2,26 +2,32 @@
 Main pipeline: embed -> cluster -> phylogeny
 """
 import argparse
-from embed import main as embed_main
+from embed import main as embed_main, DECODE_WORKERS
+from chunking import POOLING_MODES
 from cluster import main as cluster_main
+from reduction import REDUCE_DIM, REDUCTIONS
 from phylogeny import main as phylogeny_main
 
 
-def run_pipeline(mode: str = "image", source_dir: str = None, max_items: int = 500):
+def run_pipeline(mode: str = "image", source_dir: str = None, max_items: int = 500, use_cache: bool = True,
+                 workers: int = DECODE_WORKERS, chunk: bool = False, pooling: str = "mean",
+                 scan_manifest: bool = False, dedup: bool = False, incremental: bool = False,
+                 refit: bool = False, reduce: str = "none", reduce_dim: int = REDUCE_DIM):
     print("=" * 50)
     print(f"STEP 1: Generating {mode} embeddings")
     print("=" * 50)
-    embed_main(mode=mode, source_dir=source_dir, max_items=max_items)
+    embed_main(mode=mode, source_dir=source_dir, max_items=max_items, use_cache=use_cache, workers=workers,
+               chunk=chunk, pooling=pooling, scan_manifest=scan_manifest, dedup=dedup)
     
     print("\n" + "=" * 50)
     print("STEP 2: UMAP + Clustering")
     print("=" * 50)
-    cluster_main(mode=mode)
+    cluster_main(mode=mode, incremental=incremental, refit=refit, reduce=reduce, reduce_dim=reduce_dim)
     
     print("\n" + "=" * 50)
     print("STEP 3: Building phylogeny tree")
     print("=" * 50)
-    phylogeny_main(mode=mode)
+    phylogeny_main(mode=mode, incremental=incremental, rebuild=refit)
     
     print("\n" + "=" * 50)
     print("Pipeline complete! Output: data/embeddings.json")
@@ -34,6 +40,26 @@ if __name__ == "__main__":
                         help="Embedding mode: image or text")
     parser.add_argument("--input", type=str, help="Source directory path")
     parser.add_argument("--max", type=int, default=500, help="Max items to process")
+    parser.add_argument("--no-cache", action="store_true", help="Re-encode everything, ignoring the embedding cache")
+    parser.add_argument("--workers", type=int, default=DECODE_WORKERS,
+                        help="Image decode/preprocess threads running ahead of inference (0 = serial)")
+    parser.add_argument("--chunk", action="store_true",
+                        help="Text mode: embed whole documents as pooled overlapping token windows")
+    parser.add_argument("--pooling", choices=POOLING_MODES, default="mean",
+                        help="How chunk vectors are pooled into a document vector")
+    parser.add_argument("--scan-manifest", action="store_true",
+                        help="Persist a directory manifest and skip re-listing unchanged directories")
+    parser.add_argument("--dedup", action="store_true",
+                        help="Image mode: embed one representative per near-duplicate group (perceptual hash)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Reuse persisted UMAP/HDBSCAN models and phylogeny tree; only place/attach new items")
+    parser.add_argument("--refit", action="store_true", help="Force a full UMAP/HDBSCAN refit and tree rebuild")
+    parser.add_argument("--reduce", choices=REDUCTIONS, default="none",
+                        help="Linear pre-reduction (randomized PCA / sparse random projection) before UMAP")
+    parser.add_argument("--reduce-dim", type=int, default=REDUCE_DIM, help="Target dimension for --reduce")
     
     args = parser.parse_args()
-    run_pipeline(mode=args.mode, source_dir=args.input, max_items=args.max)
+    run_pipeline(mode=args.mode, source_dir=args.input, max_items=args.max, use_cache=not args.no_cache,
+                 workers=args.workers, chunk=args.chunk, pooling=args.pooling, scan_manifest=args.scan_manifest,
+                 dedup=args.dedup, incremental=args.incremental, refit=args.refit,
+                 reduce=args.reduce, reduce_dim=args.reduce_dim)
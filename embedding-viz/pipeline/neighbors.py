@@ -0,0 +1,101 @@
+"""
+Shared approximate nearest-neighbour graph (NN-descent, cosine).
+
+Built once per embedding set and cached in data/cache/knn_{mode}_{dim}.pkl, keyed by a
+digest of the matrix. UMAP consumes it as precomputed_knn (together with the search
+index, so reducer.transform keeps working) and phylogeny draws its candidate edges
+from it instead of an all-pairs similarity matrix.
+"""
+import hashlib
+import pickle
+from pathlib import Path
+import numpy as np
+
+CACHE_DIR = Path(__file__).parent.parent / "data" / "cache"
+KNN_K = 30  # >= UMAP's n_neighbors; umap_knn() hands UMAP only the first n_neighbors, the rest feed phylogeny
+
+
+class KnnGraph:
+    """(N, k) neighbour indices and cosine distances (self at column 0) plus the NN-descent index."""
+
+    def __init__(self, indices: np.ndarray, distances: np.ndarray, index=None, digest: str = None):
+        self.indices = indices
+        self.distances = distances
+        self.index = index
+        self.digest = digest
+
+    @property
+    def k(self) -> int:
+        return self.indices.shape[1]
+
+    def umap_knn(self, n_neighbors: int) -> tuple:
+        """
+        The precomputed_knn tuple UMAP expects, cut to its n_neighbors columns
+        (umap-learn only prunes wider graphs itself from 4096 items up).
+        """
+        return self.indices[:, :n_neighbors], self.distances[:, :n_neighbors], self.index
+
+    def edges(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Undirected edge list (i < j, deduplicated) as (rows, cols, cosine similarity)."""
+        n = len(self.indices)
+        rows = np.repeat(np.arange(n), self.k)
+        cols = self.indices.ravel()
+        sims = 1 - self.distances.ravel()
+        keep = (cols >= 0) & (rows != cols)
+        rows, cols, sims = rows[keep], cols[keep], sims[keep]
+        lo, hi = np.minimum(rows, cols), np.maximum(rows, cols)
+        _, first = np.unique(lo.astype(np.int64) * n + hi, return_index=True)
+        return lo[first], hi[first], sims[first]
+
+
+def embedding_digest(embeddings: np.ndarray) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    h.update(str(embeddings.shape).encode())
+    h.update(np.ascontiguousarray(embeddings, dtype=np.float32).data)
+    return h.hexdigest()
+
+
+def knn_path(mode: str, dim: int) -> Path:
+    # One slot per dimensionality: a pre-reduced UMAP input and the full phylogeny input don't evict each other.
+    return CACHE_DIR / f"knn_{mode}_{dim}.pkl"
+
+
+def build_knn_graph(embeddings: np.ndarray, k: int = KNN_K) -> KnnGraph:
+    """NN-descent kNN graph under cosine distance."""
+    from pynndescent import NNDescent  # ships with umap-learn
+    n = len(embeddings)
+    k = min(k, n - 1)
+    print(f"Building {k}-NN graph for {n} items (NN-descent)...")
+    index = NNDescent(
+        np.array(embeddings, dtype=np.float32),  # writable copy: numba kernels reject read-only memmaps
+        metric="cosine",
+        n_neighbors=k,
+        random_state=42,
+        low_memory=True,
+    )
+    indices, distances = index.neighbor_graph
+    return KnnGraph(indices, distances.astype(np.float32), index)
+
+
+def load_knn_graph(embeddings: np.ndarray, mode: str, k: int = KNN_K) -> KnnGraph:
+    """Cached kNN graph for this exact embedding matrix; rebuilt (and re-cached) when it changes."""
+    digest = embedding_digest(embeddings)
+    path = knn_path(mode, embeddings.shape[1])
+    if path.exists():
+        try:
+            with open(path, "rb") as f:
+                graph = pickle.load(f)
+            if graph.digest == digest and graph.k >= min(k, len(embeddings) - 1):
+                print(f"Loaded cached {graph.k}-NN graph ({path.name})")
+                return graph
+        except Exception as e:
+            print(f"Ignoring unreadable kNN cache {path}: {e}")
+
+    graph = build_knn_graph(embeddings, k)
+    graph.digest = digest
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "wb") as f:
+        pickle.dump(graph, f, protocol=pickle.HIGHEST_PROTOCOL)
+    tmp.replace(path)
+    return graph
@@ -0,0 +1,81 @@
+"""
+Single writer for pipeline outputs.
+
+Each artifact is serialized once and the same bytes are written to every target.
+The browser payload is slimmed before serialization: no embedding vectors,
+coordinates rounded to COORD_DECIMALS, and full_text moved to a side file
+(text_{mode}.json, fetched only when an item is opened). Browser files also get
+pre-compressed .gz and .br siblings for static servers (gzip_static / brotli_static).
+"""
+import gzip
+import json
+import os
+from pathlib import Path
+
+COORD_DECIMALS = 4  # ~1e-4 UMAP units: far below a pixel at max zoom
+DROPPED_FIELDS = ("embedding",)
+SIDE_TEXT_FIELD = "full_text"
+
+
+def dumps(obj) -> bytes:
+    return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+
+def write_bytes(data: bytes, paths: list[Path], compress: bool = False):
+    """Write `data` to every path (atomically), plus .gz/.br variants when compress is set."""
+    variants = [("", data)]
+    if compress:
+        variants.append((".gz", gzip.compress(data, compresslevel=9, mtime=0)))
+        try:
+            import brotli  # optional: only needed for .br variants
+            variants.append((".br", brotli.compress(data, quality=11)))
+        except ImportError:
+            pass
+    for path in paths:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        for suffix, payload in variants:
+            target = path.with_name(path.name + suffix)
+            tmp = target.with_name(target.name + ".tmp")
+            with open(tmp, "wb") as f:
+                f.write(payload)
+            os.replace(tmp, target)
+
+
+def write_json(obj, paths: list[Path], compress: bool = False) -> int:
+    """Serialize once, write everywhere; returns the uncompressed size."""
+    data = dumps(obj)
+    write_bytes(data, paths, compress)
+    return len(data)
+
+
+def _round(values, decimals: int = COORD_DECIMALS):
+    return [round(float(v), decimals) for v in values]
+
+
+def browser_item(item: dict) -> dict:
+    out = {k: v for k, v in item.items() if k not in DROPPED_FIELDS and k != SIDE_TEXT_FIELD}
+    if "umap" in out:
+        out["umap"] = _round(out["umap"])
+    return out
+
+
+def browser_payload(output: dict) -> tuple[dict, dict]:
+    """(slim payload, {content path: full_text}) for the frontend."""
+    side = {item["content"]: item[SIDE_TEXT_FIELD] for item in output["items"] if item.get(SIDE_TEXT_FIELD)}
+    payload = {**output, "items": [browser_item(item) for item in output["items"]]}
+    if "clusters" in output:
+        payload["clusters"] = [{**c, "centroid": _round(c["centroid"])} for c in output["clusters"]]
+    return payload, side
+
+
+def write_browser_output(output: dict, mode: str, public_dir: Path, public_name: str) -> dict:
+    """Write the slim payload and its text side file (each with .gz/.br); returns the payload."""
+    payload, side = browser_payload(output)
+    path = public_dir / public_name
+    size = write_json(payload, [path], compress=True)
+    print(f"Saved browser payload to {path} ({size / 1024:.0f} KB)")
+    if side:
+        side_path = public_dir / f"text_{mode}.json"
+        size = write_json(side, [side_path], compress=True)
+        print(f"Saved full text side file to {side_path} ({size / 1024:.0f} KB)")
+    return payload
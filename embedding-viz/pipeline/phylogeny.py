@@ -2,17 +2,32 @@
 Phylogeny tree construction using similarity + temporal constraints.
 Groups nodes into "species" based on cluster membership and time periods.
 """
+import argparse
+import hashlib
 import json
+import os
+import pickle
 from pathlib import Path
 from datetime import datetime
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
-from scipy.sparse.csgraph import minimum_spanning_tree
+from scipy import sparse
+from scipy.sparse.csgraph import breadth_first_order, connected_components, minimum_spanning_tree
+from store import has_store, load_matrix, load_store, as_float32
+from neighbors import CACHE_DIR, KNN_K, KnnGraph, embedding_digest, load_knn_graph
+from table import ItemTable
+from output import write_json
 
 DATA_DIR = Path(__file__).parent.parent / "data"
 
 TEMPORAL_THRESHOLD = 30 * 24 * 60 * 60  # 30 days
 SIMILARITY_THRESHOLD = 0.85
+BLOCK_SIZE = 2048  # similarity tile side for the blocked edge builder
+GRAPH_WORKERS = min(4, os.cpu_count() or 1)
+MIN_EDGE_WEIGHT = 1e-9  # csgraph treats zero weights as missing edges
+KNN_LIMIT = 50000  # above this many items, the similarity range search uses the shared kNN graph
+REBUILD_FRACTION = 0.2  # rebuild once items attached since the last full build exceed this share of it
 
 
 def load_clustered_data(mode: str = None) -> dict:
@@ -26,61 +41,277 @@ def load_clustered_data(mode: str = None) -> dict:
         return json.load(f)
 
 
+def load_item_embeddings(items: list[dict], mode: str) -> np.ndarray:
+    """Embeddings aligned with items: inline vectors (old clustered files) or the binary store."""
+    if items and "embedding" in items[0]:
+        return np.array([item.pop("embedding") for item in items], dtype=np.float32)
+    if has_store(mode, DATA_DIR):
+        embeddings = as_float32(load_matrix(mode, DATA_DIR))
+    else:
+        embeddings = load_store(mode, DATA_DIR)[1]
+    if len(embeddings) != len(items):
+        raise ValueError(f"Embedding store has {len(embeddings)} rows but clustered data has {len(items)} items; re-run cluster.py")
+    return embeddings
+
+
 def compute_similarity_matrix(embeddings: np.ndarray) -> np.ndarray:
     """Compute cosine similarity matrix."""
     similarity = embeddings @ embeddings.T
     return similarity
 
 
+def edge_distances(sims: np.ndarray, time_diff: np.ndarray, temporal_threshold: int = TEMPORAL_THRESHOLD) -> np.ndarray:
+    """Edge weight: 1 - similarity, plus 0.01 per temporal threshold of time apart."""
+    return (1 - sims) + (time_diff / temporal_threshold) * 0.01
+
+
+def edge_rule(sims: np.ndarray, time_diff: np.ndarray, temporal_threshold: int = TEMPORAL_THRESHOLD,
+              similarity_threshold: float = SIMILARITY_THRESHOLD, temporal: bool = True) -> np.ndarray:
+    """
+    Which pairs get an edge: temporally close OR highly similar. With temporal=False,
+    only the pairs the similarity rule adds outside the temporal window.
+    """
+    close = time_diff < temporal_threshold
+    similar = sims > similarity_threshold
+    return (close | similar) if temporal else (~close & similar)
+
+
+def _tile_edges(sim: np.ndarray, ts_rows: np.ndarray, ts_cols: np.ndarray, diagonal: bool, thresholds: tuple,
+                temporal: bool = True):
+    """Edges inside one similarity tile: (local rows, local cols, sims, time diffs), upper triangle on the diagonal."""
+    time_diff = np.abs(ts_rows[:, None] - ts_cols[None, :])
+    keep = edge_rule(sim, time_diff, *thresholds, temporal=temporal)
+    if diagonal:
+        keep &= np.triu(np.ones(keep.shape, dtype=bool), k=1)
+    rows, cols = np.nonzero(keep)
+    return rows, cols, sim[rows, cols], time_diff[rows, cols]
+
+
+def _run_tiles(run, tiles: list, workers: int) -> tuple[np.ndarray, ...]:
+    """Concatenated (rows, cols, sims, time diffs) of run(tile) over all tiles, on a thread pool when workers > 1."""
+    if workers > 1:
+        with ThreadPoolExecutor(workers) as pool:
+            parts = list(pool.map(run, tiles))
+    else:
+        parts = [run(tile) for tile in tiles]
+    if not parts:
+        return np.empty(0, np.int64), np.empty(0, np.int64), np.empty(0, np.float32), np.empty(0, np.int64)
+    return tuple(np.concatenate(p) for p in zip(*parts))
+
+
+def pair_edges(
+    timestamps: np.ndarray,
+    similarity: np.ndarray = None,
+    embeddings: np.ndarray = None,
+    block: int = BLOCK_SIZE,
+    workers: int = 1,
+    temporal: bool = True,
+    thresholds: tuple = (TEMPORAL_THRESHOLD, SIMILARITY_THRESHOLD),
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    All edges (rows, cols, sims, time diffs) with i < j, computed tile by tile.
+    Similarity tiles are sliced from `similarity` or multiplied out of `embeddings`,
+    so memory stays at a few block x block arrays plus the edges themselves.
+    Tiles run on a thread pool when workers > 1 (NumPy releases the GIL).
+    With temporal=False only the pairs the similarity rule adds on top of the
+    temporal window are kept (an exact inner-product range search).
+    """
+    n = len(timestamps)
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    tiles = [(i, j) for i in range(0, n, block) for j in range(i, n, block)]
+
+    def run(tile):
+        i, j = tile
+        if similarity is not None:
+            sim = similarity[i:i + block, j:j + block]
+        else:
+            sim = embeddings[i:i + block] @ embeddings[j:j + block].T
+        rows, cols, sims, time_diff = _tile_edges(
+            sim, timestamps[i:i + block], timestamps[j:j + block], i == j, thresholds, temporal)
+        return rows + i, cols + j, sims, time_diff
+
+    return _run_tiles(run, tiles, workers)
+
+
+def constrained_edges(
+    timestamps: np.ndarray,
+    similarity: np.ndarray = None,
+    embeddings: np.ndarray = None,
+    block: int = BLOCK_SIZE,
+    workers: int = 1,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """All constrained edges as (rows, cols, distances) with i < j; see pair_edges."""
+    rows, cols, sims, time_diff = pair_edges(timestamps, similarity, embeddings, block, workers)
+    # Same arithmetic (and dtypes) as the old per-pair loop: 1 - sim, then the time penalty in float64
+    return rows, cols, edge_distances(sims, time_diff)
+
+
 def build_constrained_graph(
     similarity: np.ndarray,
-    timestamps: np.ndarray
+    timestamps: np.ndarray,
+    block: int = BLOCK_SIZE,
+    workers: int = 1,
 ) -> np.ndarray:
     """Build distance graph with temporal constraints."""
     n = len(timestamps)
     distances = np.full((n, n), np.inf)
-    
-    for i in range(n):
-        for j in range(i + 1, n):
-            time_diff = abs(timestamps[i] - timestamps[j])
-            sim = similarity[i, j]
-            
-            temporally_close = time_diff < TEMPORAL_THRESHOLD
-            highly_similar = sim > SIMILARITY_THRESHOLD
-            
-            if temporally_close or highly_similar:
-                dist = 1 - sim
-                dist += (time_diff / TEMPORAL_THRESHOLD) * 0.01
-                distances[i, j] = dist
-                distances[j, i] = dist
-    
+    rows, cols, dist = constrained_edges(timestamps, similarity=similarity, block=block, workers=workers)
+    distances[rows, cols] = dist
+    distances[cols, rows] = dist
     return distances
 
 
-def generate_species(items: list[dict], clusters: list[dict]) -> list[dict]:
+def temporal_edges(
+    embeddings: np.ndarray,
+    timestamps: np.ndarray,
+    block: int = BLOCK_SIZE,
+    workers: int = 1,
+    temporal_threshold: int = TEMPORAL_THRESHOLD,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Edges (i < j) less than `temporal_threshold` apart. A sliding window over the
+    sorted timestamps bounds each row's partners, so only tiles on the band
+    around the diagonal of the time-sorted similarity matrix are multiplied out.
+    """
+    n = len(timestamps)
+    order = np.argsort(timestamps, kind="stable")
+    ts = timestamps[order]
+    x = embeddings[order]
+    end = np.searchsorted(ts, ts + temporal_threshold, side="left")  # sorted row p pairs with (p, end[p])
+    tiles = [(i, j) for i in range(0, n, block) for j in range(i, int(end[min(i + block, n) - 1]), block)]
+
+    def run(tile):
+        i, j = tile
+        p, q = np.arange(i, min(i + block, n)), np.arange(j, min(j + block, n))
+        keep = (q[None, :] > p[:, None]) & (q[None, :] < end[p][:, None])
+        r, c = np.nonzero(keep)
+        sim = x[i:i + block] @ x[j:j + block].T
+        a, b = order[r + i], order[c + j]
+        return np.minimum(a, b), np.maximum(a, b), sim[r, c], ts[c + j] - ts[r + i]
+
+    return _run_tiles(run, tiles, workers)
+
+
+def knn_similar_edges(graph: KnnGraph, timestamps: np.ndarray,
+                      thresholds: tuple = (TEMPORAL_THRESHOLD, SIMILARITY_THRESHOLD)) -> tuple[np.ndarray, ...]:
+    """Approximate range search: kNN pairs above the similarity threshold and outside the temporal window."""
+    rows, cols, sims = graph.edges()
+    time_diff = np.abs(timestamps[rows] - timestamps[cols])
+    keep = edge_rule(sims, time_diff, *thresholds, temporal=False)
+    return rows[keep], cols[keep], sims[keep], time_diff[keep]
+
+
+def edge_graph(rows: np.ndarray, cols: np.ndarray, dist: np.ndarray, n: int) -> sparse.csr_matrix:
+    """Upper-triangular sparse distance graph (absent = no edge), as minimum_spanning_tree expects."""
+    dist = np.maximum(dist, MIN_EDGE_WEIGHT)
+    return sparse.coo_matrix((dist, (rows, cols)), shape=(n, n)).tocsr()
+
+
+def candidate_edges(
+    embeddings: np.ndarray,
+    timestamps: np.ndarray,
+    graph: KnnGraph = None,
+    block: int = BLOCK_SIZE,
+    workers: int = 1,
+    thresholds: tuple = (TEMPORAL_THRESHOLD, SIMILARITY_THRESHOLD),
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Every edge (rows, cols, sims, time diffs) under `thresholds`, without any n x n array.
+    Temporal edges come from a sliding window over sorted timestamps; the extra
+    high-similarity edges from a blocked range search (or the kNN graph when given).
+    Memory scales with the number of edges.
+    """
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    temporal = temporal_edges(embeddings, timestamps, block, workers, thresholds[0])
+    if graph is None:
+        similar = pair_edges(timestamps, embeddings=embeddings, block=block, workers=workers, temporal=False,
+                             thresholds=thresholds)
+    else:
+        similar = knn_similar_edges(graph, timestamps, thresholds)
+    print(f"  {len(temporal[0])} temporal edges, {len(similar[0])} similarity edges")
+    return tuple(np.concatenate([t, s]) for t, s in zip(temporal, similar))
+
+
+def build_sparse_constrained_graph(
+    embeddings: np.ndarray,
+    timestamps: np.ndarray,
+    graph: KnnGraph = None,
+    block: int = BLOCK_SIZE,
+    workers: int = 1,
+) -> sparse.csr_matrix:
+    """Same edge rule and weights as build_constrained_graph, as a sparse graph (see candidate_edges)."""
+    rows, cols, sims, time_diff = candidate_edges(embeddings, timestamps, graph, block, workers)
+    return edge_graph(rows, cols, edge_distances(sims, time_diff), len(timestamps))
+
+
+def edges_path(mode: str) -> Path:
+    return CACHE_DIR / f"edges_{mode}.npz"
+
+
+def edges_digest(embeddings: np.ndarray, timestamps: np.ndarray) -> str:
+    """Embedding digest plus a hash of the exact int64 timestamps (float32 would round them)."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(np.ascontiguousarray(timestamps, dtype=np.int64).data)
+    return embedding_digest(embeddings) + h.hexdigest()
+
+
+def filter_edges(edges: tuple, thresholds: tuple) -> tuple[np.ndarray, ...]:
+    """The subset of a candidate edge set (rows, cols, sims, time diffs) admitted under stricter thresholds."""
+    keep = edge_rule(edges[2], edges[3], *thresholds)
+    return tuple(e[keep] for e in edges)
+
+
+def save_candidate_edges(mode: str, edges: tuple, thresholds: tuple, digest: str):
+    """Store a candidate superset computed at (loosest temporal, loosest similarity) thresholds."""
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    path = edges_path(mode)
+    tmp = path.with_name(path.stem + ".tmp.npz")
+    rows, cols, sims, time_diff = edges
+    np.savez(tmp, rows=rows, cols=cols, sims=sims, time_diff=time_diff,
+             thresholds=np.array(thresholds, dtype=np.float64), digest=np.array(digest))
+    tmp.replace(path)
+
+
+def load_candidate_edges(mode: str, digest: str, thresholds: tuple) -> tuple | None:
+    """Cached candidates for this exact data, if they were computed at thresholds at least as loose."""
+    path = edges_path(mode)
+    if not path.exists():
+        return None
+    try:
+        with np.load(path) as f:
+            cached = tuple(f["thresholds"].tolist())
+            if str(f["digest"]) != digest or cached[0] < thresholds[0] or cached[1] > thresholds[1]:
+                return None
+            edges = f["rows"], f["cols"], f["sims"], f["time_diff"]
+    except Exception as e:
+        print(f"Ignoring unreadable candidate edges {path}: {e}")
+        return None
+    print(f"Loaded {len(edges[0])} cached candidate edges ({path.name})")
+    return edges
+
+
+def generate_species(table: ItemTable, clusters: list[dict]) -> list[dict]:
     """
     Generate species by grouping clusters with time periods.
     Each species is a cluster + time range combination.
     """
-    # Group items by cluster
-    cluster_items = defaultdict(list)
-    for item in items:
-        if item["cluster"] >= 0:
-            cluster_items[item["cluster"]].append(item)
+    # Group rows by cluster (noise excluded), then reduce timestamps per group
+    cluster_ids, members = table.group_rows()
+    timestamps = table["timestamp"]
+    ids = table["id"]
     
     species = []
     cluster_map = {c["id"]: c for c in clusters}
     
-    for cluster_id, items_in_cluster in cluster_items.items():
+    for cluster_id, rows in zip(cluster_ids.tolist(), members):
         if cluster_id not in cluster_map:
             continue
             
         cluster = cluster_map[cluster_id]
         
         # Get time range
-        timestamps = [item["timestamp"] for item in items_in_cluster]
-        min_ts = min(timestamps)
-        max_ts = max(timestamps)
+        min_ts = int(timestamps[rows].min())
+        max_ts = int(timestamps[rows].max())
         
         # Format dates
         min_date = datetime.fromtimestamp(min_ts).strftime("%Y-%m")
@@ -99,8 +330,8 @@ def generate_species(items: list[dict], clusters: list[dict]) -> list[dict]:
             "min_timestamp": min_ts,
             "max_timestamp": max_ts,
             "centroid": cluster["centroid"],
-            "count": len(items_in_cluster),
-            "item_ids": [item["id"] for item in items_in_cluster]
+            "count": len(rows),
+            "item_ids": ids[rows].tolist()
         })
     
     # Sort by earliest timestamp
@@ -109,112 +340,225 @@ def generate_species(items: list[dict], clusters: list[dict]) -> list[dict]:
     return species
 
 
-def build_phylogeny_tree(distances: np.ndarray, items: list[dict]) -> dict:
-    """Build MST and convert to hierarchical structure."""
-    print("Building minimum spanning tree...")
+def spanning_forest(mst: sparse.spmatrix, timestamps: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    (parent row index per node, -1 for roots; roots sorted by timestamp) of an MST forest.
+    Each connected component is rooted at its earliest item. A virtual node linked
+    to every root lets a single breadth_first_order call cover the whole forest.
+    """
+    n = mst.shape[0]
+    adjacency = (mst + mst.T).tocsr()
+    _, component = connected_components(adjacency, directed=False)
+    order = np.argsort(timestamps, kind="stable")
+    _, first = np.unique(component[order], return_index=True)
+    roots = order[np.sort(first)]
     
-    distances_fallback = distances.copy()
-    distances_fallback[distances_fallback == np.inf] = 1000
-    
-    mst = minimum_spanning_tree(distances_fallback)
-    mst_array = mst.toarray()
-    
-    # Find root (earliest timestamp)
-    timestamps = [item["timestamp"] for item in items]
-    root_idx = np.argmin(timestamps)
-    root_ts = min(timestamps)
-    
-    # Format root date
-    root_date = datetime.fromtimestamp(root_ts).strftime("%Y-%m-%d")
-    
-    # BFS from root
-    n = len(items)
-    visited = [False] * n
-    parent = [-1] * n
-    queue = [root_idx]
-    visited[root_idx] = True
-    
-    mst_symmetric = mst_array + mst_array.T
-    
-    while queue:
-        node = queue.pop(0)
-        for neighbor in range(n):
-            if mst_symmetric[node, neighbor] > 0 and not visited[neighbor]:
-                visited[neighbor] = True
-                parent[neighbor] = node
-                queue.append(neighbor)
-    
-    for i in range(n):
-        if not visited[i]:
-            parent[i] = root_idx
-    
-    # Build nodes list
-    nodes = []
-    for i, item in enumerate(items):
-        ts = item["timestamp"]
-        date_str = datetime.fromtimestamp(ts).strftime("%Y-%m-%d")
-        node = {
-            "id": item["id"],
-            "parent": items[parent[i]]["id"] if parent[i] >= 0 else None,
-            "timestamp": ts,
-            "date": date_str,
-            "cluster": item["cluster"]
-        }
-        nodes.append(node)
+    links = sparse.csr_matrix((np.ones(len(roots)), (np.full(len(roots), n), roots)), shape=(n + 1, n + 1))
+    adjacency.resize((n + 1, n + 1))
+    _, predecessors = breadth_first_order(adjacency + links, n, directed=False, return_predecessors=True)
+    parent = predecessors[:n].astype(np.int64)
+    parent[roots] = -1
+    return parent, roots
+
+
+def tree_output(parent: np.ndarray, table: ItemTable) -> dict:
+    """
+    Phylogeny JSON for a forest given as parent row indices (-1 for roots).
+    Nodes are the item rows: `parent` holds each item's parent row index, and
+    `roots` the root rows, earliest first.
+    """
+    timestamps = table["timestamp"]
+    ids = table["id"]
+    roots = np.flatnonzero(parent < 0)
+    roots = roots[np.argsort(timestamps[roots], kind="stable")]
+    root_idx = int(roots[0])
+    root_date = datetime.fromtimestamp(int(timestamps[root_idx])).strftime("%Y-%m-%d")
     
-    print(f"Built tree with {len(nodes)} nodes, root: {items[root_idx]['id']} ({root_date})")
+    print(f"Built tree with {len(parent)} nodes in {len(roots)} component(s), root: {ids[root_idx]} ({root_date})")
     
     return {
-        "nodes": nodes,
-        "root_id": items[root_idx]["id"],
+        "parent": parent.tolist(),
+        "roots": roots.tolist(),
+        "root_id": ids[root_idx],
         "root_date": root_date,
         "date_range": {
-            "min": datetime.fromtimestamp(min(timestamps)).strftime("%Y-%m-%d"),
-            "max": datetime.fromtimestamp(max(timestamps)).strftime("%Y-%m-%d")
+            "min": datetime.fromtimestamp(int(timestamps.min())).strftime("%Y-%m-%d"),
+            "max": datetime.fromtimestamp(int(timestamps.max())).strftime("%Y-%m-%d")
         }
     }
 
 
-def main(mode: str = None):
+def build_phylogeny_tree(distances: np.ndarray | sparse.spmatrix, table: ItemTable) -> dict:
+    """Build MST and convert to a rooted forest."""
+    print("Building minimum spanning tree...")
+    
+    if not sparse.issparse(distances):
+        distances = np.where(np.isfinite(distances), distances, 0)  # dense input: 0 = no edge
+    mst = minimum_spanning_tree(distances)
+    
+    parent, _ = spanning_forest(mst, table["timestamp"])
+    return tree_output(parent, table)
+
+
+def tree_state_path(mode: str) -> Path:
+    return CACHE_DIR / f"tree_{mode}.pkl"
+
+
+def load_tree_state(mode: str) -> dict | None:
+    path = tree_state_path(mode)
+    if not path.exists():
+        return None
+    try:
+        with open(path, "rb") as f:
+            return pickle.load(f)
+    except Exception as e:
+        print(f"Ignoring unreadable tree state {path}: {e}")
+        return None
+
+
+def save_tree_state(mode: str, state: dict):
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    path = tree_state_path(mode)
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "wb") as f:
+        pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+    tmp.replace(path)
+
+
+def new_tree_state(keys: list[str], parent: np.ndarray, timestamps: np.ndarray, graph: KnnGraph) -> dict:
+    """State right after a full rebuild; `graph.index` answers neighbour queries for later items."""
+    return {
+        "thresholds": (TEMPORAL_THRESHOLD, SIMILARITY_THRESHOLD),
+        "keys": list(keys),
+        "parent": np.asarray(parent, dtype=np.int64),
+        "timestamps": np.asarray(timestamps, dtype=np.int64),
+        "index": graph.index,
+        "index_keys": list(keys),
+        "built": len(keys),
+        "attached": 0,
+    }
+
+
+def attach_new_items(state: dict, embeddings: np.ndarray, keys: list[str], timestamps: np.ndarray,
+                     rebuild_fraction: float = REBUILD_FRACTION) -> tuple[np.ndarray, dict] | None:
+    """
+    Extend the persisted tree with items it hasn't seen. Returns (parent, updated state),
+    or None when a full rebuild is due (items removed, thresholds changed, or too many
+    items attached since the last rebuild).
+
+    Each new item (earliest first) hangs off its best admissible edge under the same
+    rule as the full build. Candidates are the item's kNN from the persisted index
+    (the similarity rule), the stored items inside its temporal window (binary search
+    over sorted timestamps) and the new items already attached; an item with no
+    admissible edge becomes a new root.
+    """
+    if state.get("thresholds") != (TEMPORAL_THRESHOLD, SIMILARITY_THRESHOLD):
+        print("Saved tree used different thresholds; rebuilding")
+        return None
+    index = {k: i for i, k in enumerate(state["keys"])}
+    rows = np.array([index.get(k, -1) for k in keys], dtype=np.int64)
+    known, new = np.flatnonzero(rows >= 0), np.flatnonzero(rows < 0)
+    if len(known) < len(state["keys"]):
+        print(f"{len(state['keys']) - len(known)} items removed since the last build; rebuilding")
+        return None
+    attached = state["attached"] + len(new)
+    if attached > rebuild_fraction * state["built"]:
+        print(f"{attached} items attached since the last build (> {rebuild_fraction:.0%} of {state['built']}); rebuilding")
+        return None
+    
+    # Carry the stored tree over to the current row order
+    position = np.empty(len(state["keys"]), dtype=np.int64)
+    position[rows[known]] = known
+    parent = np.full(len(keys), -1, dtype=np.int64)
+    old_parent = state["parent"][rows[known]]
+    parent[known] = np.where(old_parent >= 0, position[np.maximum(old_parent, 0)], -1)
+    
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    new = new[np.argsort(timestamps[new], kind="stable")]
+    if len(new):
+        by_time = known[np.argsort(timestamps[known], kind="stable")]
+        sorted_ts = timestamps[by_time]
+        lo = np.searchsorted(sorted_ts, timestamps[new] - TEMPORAL_THRESHOLD, side="right")
+        hi = np.searchsorted(sorted_ts, timestamps[new] + TEMPORAL_THRESHOLD, side="left")
+        key_rows = {k: i for i, k in enumerate(keys)}
+        index_rows = np.array([key_rows.get(k, -1) for k in state["index_keys"]], dtype=np.int64)
+        neighbours, _ = state["index"].query(np.asarray(embeddings[new], dtype=np.float32), k=min(KNN_K, len(index_rows)))
+        
+        for n_done, (item, window) in enumerate(zip(new.tolist(), zip(lo.tolist(), hi.tolist()))):
+            candidates = np.unique(np.concatenate([
+                index_rows[neighbours[n_done]], by_time[window[0]:window[1]], new[:n_done]]))
+            candidates = candidates[candidates >= 0]
+            sims = embeddings[candidates] @ embeddings[item]
+            time_diff = np.abs(timestamps[candidates] - timestamps[item])
+            admissible = edge_rule(sims, time_diff)
+            if admissible.any():
+                dist = edge_distances(sims[admissible], time_diff[admissible])
+                parent[item] = candidates[admissible][np.argmin(dist)]
+    print(f"Incremental tree: {len(known)} kept, {len(new)} attached")
+    
+    state = {**state, "keys": list(keys), "parent": parent, "timestamps": timestamps, "attached": attached}
+    return parent, state
+
+
+def main(mode: str = None, incremental: bool = False, rebuild: bool = False):
     data = load_clustered_data(mode)
-    items = data["items"]
     clusters = data["clusters"]
     mode = data.get("mode", "image")
     
-    # Extract embeddings and timestamps
-    embeddings = np.array([item["embedding"] for item in items])
-    timestamps = np.array([item["timestamp"] for item in items])
+    # Extract embeddings, then hold items as columns
+    embeddings = load_item_embeddings(data["items"], mode)
+    table = ItemTable.from_items(data.pop("items"))
+    timestamps = table["timestamp"]
+    keys = table["content"].tolist()
     
-    print("Computing similarity matrix...")
-    similarity = compute_similarity_matrix(embeddings)
-    
-    print("Building constrained graph...")
-    distances = build_constrained_graph(similarity, timestamps)
-    
-    # Build phylogeny
-    phylogeny = build_phylogeny_tree(distances, items)
+    state = load_tree_state(mode) if incremental and not rebuild else None
+    result = attach_new_items(state, embeddings, keys, timestamps) if state else None
+    if result is not None:
+        parent, state = result
+        phylogeny = tree_output(parent, table)
+    else:
+        thresholds = (TEMPORAL_THRESHOLD, SIMILARITY_THRESHOLD)
+        graph = load_knn_graph(embeddings, mode) if incremental or len(table) > KNN_LIMIT else None
+        edges = load_candidate_edges(mode, edges_digest(embeddings, timestamps), thresholds)
+        if edges is not None:
+            edges = filter_edges(edges, thresholds)
+        else:
+            print("Building constrained graph" + (" (similarity edges from kNN graph)..." if len(table) > KNN_LIMIT else "..."))
+            edges = candidate_edges(embeddings, timestamps, graph if len(table) > KNN_LIMIT else None,
+                                    workers=GRAPH_WORKERS)
+        rows, cols, sims, time_diff = edges
+        distances = edge_graph(rows, cols, edge_distances(sims, time_diff), len(table))
+        
+        # Build phylogeny
+        phylogeny = build_phylogeny_tree(distances, table)
+        if incremental:
+            state = new_tree_state(keys, np.asarray(phylogeny["parent"]), timestamps, graph)
+    if incremental:
+        save_tree_state(mode, state)
     
     # Generate species
     print("Generating species...")
-    species = generate_species(items, clusters)
+    species = generate_species(table, clusters)
     for s in species:
         print(f"  {s['name']}: {s['count']} items ({s['date_range']})")
     
     # Add to data
+    data = {"items": table.to_items(), **data}
     data["phylogeny"] = phylogeny
     data["species"] = species
     
-    # Remove raw embeddings
-    for item in data["items"]:
-        del item["embedding"]
-    
     # Save final output
     output_path = DATA_DIR / f"embeddings_{mode}.json"
-    with open(output_path, "w") as f:
-        json.dump(data, f)
+    write_json(data, [output_path])
     
     print(f"Saved final data to {output_path}")
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Build the phylogeny tree and species from clustered data")
+    parser.add_argument("--mode", choices=["image", "text"], help="Embedding mode (default: the clustered file's)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Attach new items to the persisted tree instead of rebuilding it")
+    parser.add_argument("--rebuild", action="store_true", help="Force a full rebuild (and re-save the tree state)")
+    args = parser.parse_args()
+    main(mode=args.mode, incremental=args.incremental, rebuild=args.rebuild)
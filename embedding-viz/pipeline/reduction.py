@@ -0,0 +1,44 @@
+"""
+Optional linear pre-reduction ahead of the kNN graph and UMAP.
+
+- pca:    randomized PCA to `dim` components
+- random: sparse random projection to `dim` components (data-independent, fastest)
+
+Rows are re-normalized afterwards so the cosine metric downstream stays meaningful.
+See bench_reduction.py for the cost/quality trade-off at several N.
+"""
+import numpy as np
+
+REDUCTIONS = ("none", "pca", "random")
+REDUCE_DIM = 64
+
+
+def fit_reduction(embeddings: np.ndarray, method: str = "none", dim: int = REDUCE_DIM):
+    """Fitted sklearn transformer, or None when no reduction applies."""
+    if method == "none" or dim >= embeddings.shape[1]:
+        return None
+    if method == "pca":
+        from sklearn.decomposition import PCA
+        reducer = PCA(n_components=min(dim, len(embeddings)), svd_solver="randomized", random_state=42)
+    elif method == "random":
+        from sklearn.random_projection import SparseRandomProjection
+        reducer = SparseRandomProjection(n_components=dim, dense_output=True, random_state=42)
+    else:
+        raise ValueError(f"Unknown reduction: {method}")
+    return reducer.fit(embeddings)
+
+
+def apply_reduction(reducer, embeddings: np.ndarray) -> np.ndarray:
+    if reducer is None:
+        return embeddings
+    reduced = reducer.transform(embeddings).astype(np.float32)
+    reduced /= np.maximum(np.linalg.norm(reduced, axis=1, keepdims=True), 1e-12)
+    return reduced
+
+
+def reduce_embeddings(embeddings: np.ndarray, method: str = "none", dim: int = REDUCE_DIM):
+    """Returns (fitted transformer or None, reduced float32 matrix)."""
+    reducer = fit_reduction(embeddings, method, dim)
+    if reducer is not None:
+        print(f"Pre-reducing {embeddings.shape[1]}-d embeddings to {dim}-d ({method})")
+    return reducer, apply_reduction(reducer, embeddings)
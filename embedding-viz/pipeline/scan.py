@@ -0,0 +1,113 @@
+"""
+Parallel file discovery: os.scandir over subtrees in a thread pool, keeping the N newest files.
+
+An optional manifest records each directory's mtime and listing. A directory whose
+mtime is unchanged is not re-listed or re-stat'd on the next scan. Directory mtimes
+only change when entries are added, removed or renamed, so in-place edits to an
+existing file don't change its position in the newest-N selection while the manifest
+is in use. Callers must not trust manifest stats for content caching (embed.py
+re-stats the selected files).
+"""
+import heapq
+import json
+import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import NamedTuple
+
+SCAN_WORKERS = 16  # directory listings are I/O-latency bound (network mounts), not CPU bound
+
+
+class ScannedFile(NamedTuple):
+    """Path plus the stat fields the pipeline needs; stands in for os.stat_result."""
+    path: Path
+    st_size: int
+    st_mtime_ns: int
+
+    @property
+    def st_mtime(self) -> float:
+        return self.st_mtime_ns / 1e9
+
+
+def _scan_dir(dirpath: str, extensions: set[str], cached: dict = None) -> tuple[dict, bool]:
+    """List one directory; reuse the cached listing when the directory mtime is unchanged."""
+    dir_mtime = os.stat(dirpath).st_mtime_ns
+    if cached and cached["mtime_ns"] == dir_mtime:
+        return cached, True
+
+    files, dirs = [], []
+    with os.scandir(dirpath) as it:
+        for entry in it:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    dirs.append(entry.name)
+                elif os.path.splitext(entry.name)[1].lower() in extensions and entry.is_file():
+                    st = entry.stat()
+                    files.append([entry.name, st.st_size, st.st_mtime_ns])
+            except OSError:
+                continue
+    return {"mtime_ns": dir_mtime, "files": files, "dirs": dirs}, False
+
+
+def _load_manifest(path: Path, root: str, extensions: set[str]) -> dict:
+    if path is None or not path.exists():
+        return {}
+    try:
+        with open(path) as f:
+            manifest = json.load(f)
+    except Exception as e:
+        print(f"Ignoring unreadable scan manifest {path}: {e}")
+        return {}
+    if manifest.get("root") != root or set(manifest.get("extensions", [])) != extensions:
+        return {}
+    return manifest.get("dirs", {})
+
+
+def _save_manifest(path: Path, root: str, extensions: set[str], dirs: dict):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w") as f:
+        json.dump({"root": root, "extensions": sorted(extensions), "dirs": dirs}, f)
+    os.replace(tmp, path)
+
+
+def scan_files(source_dir: Path, extensions: set[str], max_count: int = None,
+               workers: int = SCAN_WORKERS, manifest_path: Path = None) -> list[ScannedFile]:
+    """Return the max_count most recently modified matching files, oldest first."""
+    root = str(Path(source_dir).resolve())
+    extensions = {e.lower() for e in extensions}
+    cached_dirs = _load_manifest(manifest_path, root, extensions)
+    listings = {}
+    newest = []  # min-heap of (mtime_ns, path, size), capped at max_count
+    reused = 0
+
+    def keep(entry):
+        if max_count is None or len(newest) < max_count:
+            heapq.heappush(newest, entry)
+        elif entry > newest[0]:
+            heapq.heapreplace(newest, entry)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        pending = {pool.submit(_scan_dir, root, extensions, cached_dirs.get(root)): root}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                dirpath = pending.pop(future)
+                try:
+                    listing, hit = future.result()
+                except OSError as e:
+                    print(f"Skipping {dirpath}: {e}")
+                    continue
+                listings[dirpath] = listing
+                reused += hit
+                for name, size, mtime_ns in listing["files"]:
+                    keep((mtime_ns, os.path.join(dirpath, name), size))
+                for name in listing["dirs"]:
+                    sub = os.path.join(dirpath, name)
+                    pending[pool.submit(_scan_dir, sub, extensions, cached_dirs.get(sub))] = sub
+
+    if manifest_path is not None:
+        _save_manifest(manifest_path, root, extensions, listings)
+        print(f"Scanned {len(listings)} directories ({reused} unchanged since last scan)")
+
+    return [ScannedFile(Path(p), size, mtime_ns) for mtime_ns, p, size in sorted(newest)]
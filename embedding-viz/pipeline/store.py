@@ -0,0 +1,184 @@
+"""
+Binary embedding store: an (N, D) .npy matrix plus a JSON metadata sidecar.
+Downstream stages memory-map the matrix instead of parsing vectors out of JSON.
+"""
+import json
+import os
+from pathlib import Path
+import numpy as np
+
+DATA_DIR = Path(__file__).parent.parent / "data"
+STORE_DTYPES = ("float32", "float16")
+
+
+def matrix_path(mode: str, data_dir: Path = DATA_DIR) -> Path:
+    return data_dir / f"embeddings_raw_{mode}.npy"
+
+
+def meta_path(mode: str, data_dir: Path = DATA_DIR) -> Path:
+    return data_dir / f"embeddings_raw_{mode}.meta.json"
+
+
+def save_embeddings(items: list[dict], mode: str, dtype: str = "float32", data_dir: Path = DATA_DIR) -> Path:
+    """Pop each item's "embedding" into the matrix; write the rest as metadata (row i == items[i])."""
+    vectors = [item.pop("embedding") for item in items]
+    matrix = np.asarray(vectors, dtype=dtype) if vectors else np.zeros((0, 0), dtype=dtype)
+    data_dir.mkdir(parents=True, exist_ok=True)
+    np.save(matrix_path(mode, data_dir), matrix)
+    with open(meta_path(mode, data_dir), "w") as f:
+        json.dump({
+            "mode": mode,
+            "dtype": dtype,
+            "count": int(matrix.shape[0]),
+            "dim": int(matrix.shape[1]) if matrix.ndim == 2 else 0,
+            "items": items,
+        }, f)
+    return matrix_path(mode, data_dir)
+
+
+def has_store(mode: str, data_dir: Path = DATA_DIR) -> bool:
+    return matrix_path(mode, data_dir).exists() and meta_path(mode, data_dir).exists()
+
+
+def load_metadata(mode: str, data_dir: Path = DATA_DIR) -> dict:
+    with open(meta_path(mode, data_dir)) as f:
+        return json.load(f)
+
+
+def load_matrix(mode: str, data_dir: Path = DATA_DIR) -> np.ndarray:
+    """Memory-map the embedding matrix (read-only, no copy)."""
+    return np.load(matrix_path(mode, data_dir), mmap_mode="r")
+
+
+def as_float32(matrix: np.ndarray) -> np.ndarray:
+    """View float32 stores as-is; upcast float16 stores once for numeric work."""
+    return matrix if matrix.dtype == np.float32 else np.asarray(matrix, dtype=np.float32)
+
+
+def load_legacy_json(mode: str = None, data_dir: Path = DATA_DIR) -> dict:
+    """Old-style embeddings_raw_{mode}.json with vectors inline."""
+    if mode:
+        path = data_dir / f"embeddings_raw_{mode}.json"
+        if path.exists():
+            with open(path) as f:
+                return json.load(f)
+    with open(data_dir / "embeddings_raw.json") as f:
+        return json.load(f)
+
+
+def load_store(mode: str = None, data_dir: Path = DATA_DIR) -> tuple[dict, np.ndarray]:
+    """Return (metadata with items, float32 embedding matrix), falling back to legacy JSON."""
+    if mode and has_store(mode, data_dir):
+        return load_metadata(mode, data_dir), as_float32(load_matrix(mode, data_dir))
+    data = load_legacy_json(mode, data_dir)
+    matrix = np.array([item.pop("embedding") for item in data["items"]], dtype=np.float32)
+    return data, matrix
+
+
+class ShardWriter:
+    """
+    Append-only embedding shards under data/shards_{mode}/ so long embed runs survive crashes.
+    Each shard is written in full before its manifest line is appended, so the
+    manifest only ever lists complete shards.
+    """
+
+    def __init__(self, mode: str, resume: bool = False, data_dir: Path = DATA_DIR):
+        self.mode = mode
+        self.data_dir = data_dir
+        self.dir = data_dir / f"shards_{mode}"
+        self.manifest_path = self.dir / "manifest.jsonl"
+        self.entries: list[dict] = []
+        if resume and self.manifest_path.exists():
+            with open(self.manifest_path) as f:
+                for line in f:
+                    try:
+                        self.entries.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        break  # torn final line from a crash
+        elif self.dir.exists():
+            for old in self.dir.iterdir():
+                old.unlink()
+        self.dir.mkdir(parents=True, exist_ok=True)
+
+    def done_inputs(self) -> set[str]:
+        """Input paths already covered by a complete shard (including ones that were skipped)."""
+        return {p for entry in self.entries for p in entry["inputs"]}
+
+    def write(self, items: list[dict], inputs: list[str], chunks: np.ndarray = None):
+        """Persist one finished segment: vectors, item metadata, optional chunk vectors."""
+        shard = len(self.entries)
+        stem = self.dir / f"shard_{shard:05d}"
+        vectors = [item.pop("embedding") for item in items]
+        np.save(f"{stem}.npy", np.asarray(vectors, dtype=np.float32).reshape(len(items), -1))
+        with open(f"{stem}.json", "w") as f:
+            json.dump(items, f)
+        if chunks is not None:
+            np.save(f"{stem}.chunks.npy", chunks)
+        entry = {"shard": shard, "count": len(items), "chunks": 0 if chunks is None else len(chunks),
+                 "inputs": inputs}
+        with open(self.manifest_path, "a") as f:
+            f.write(json.dumps(entry) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.entries.append(entry)
+
+    def finalize(self, order: list[str], dtype: str = "float32") -> tuple[list[dict], Path]:
+        """
+        Merge shards into the binary store, rows ordered by `order` (input paths).
+        Vectors are copied shard by shard into a memory-mapped output, so memory stays flat.
+        """
+        shards = []
+        for entry in self.entries:
+            stem = self.dir / f"shard_{entry['shard']:05d}"
+            with open(f"{stem}.json") as f:
+                shards.append((entry, stem, json.load(f)))
+
+        rank = {p: i for i, p in enumerate(order)}
+        located = sorted(
+            (rank[item["content"]], s, r)
+            for s, (_, _, items) in enumerate(shards)
+            for r, item in enumerate(items)
+            if item["content"] in rank
+        )
+        position = {(s, r): i for i, (_, s, r) in enumerate(located)}
+        chunk_base = np.cumsum([0] + [entry["chunks"] for entry, _, _ in shards])
+
+        dim = 0
+        for entry, stem, _ in shards:
+            if entry["count"]:
+                dim = np.load(f"{stem}.npy", mmap_mode="r").shape[1]
+                break
+        out = np.lib.format.open_memmap(matrix_path(self.mode, self.data_dir), mode="w+",
+                                        dtype=dtype, shape=(len(located), dim))
+        meta_items = [None] * len(located)
+        for s, (entry, stem, items) in enumerate(shards):
+            vectors = np.load(f"{stem}.npy", mmap_mode="r") if entry["count"] else None
+            for r, item in enumerate(items):
+                pos = position.get((s, r))
+                if pos is None:
+                    continue
+                out[pos] = vectors[r]
+                if "chunk_offset" in item:
+                    item["chunk_offset"] += int(chunk_base[s])
+                meta_items[pos] = item
+        out.flush()
+        del out
+
+        if chunk_base[-1]:
+            chunks_out = np.lib.format.open_memmap(self.data_dir / f"chunks_{self.mode}.npy", mode="w+",
+                                                   dtype=np.float32, shape=(int(chunk_base[-1]), dim))
+            for s, (entry, stem, _) in enumerate(shards):
+                if entry["chunks"]:
+                    chunks_out[chunk_base[s]:chunk_base[s + 1]] = np.load(f"{stem}.chunks.npy", mmap_mode="r")
+            chunks_out.flush()
+            del chunks_out
+
+        with open(meta_path(self.mode, self.data_dir), "w") as f:
+            json.dump({
+                "mode": self.mode,
+                "dtype": dtype,
+                "count": len(meta_items),
+                "dim": int(dim),
+                "items": meta_items,
+            }, f)
+        return meta_items, matrix_path(self.mode, self.data_dir)
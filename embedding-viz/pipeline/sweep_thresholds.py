@@ -0,0 +1,92 @@
+"""
+Sweep the phylogeny edge thresholds without redoing the quadratic stage.
+
+Candidate edges are computed once at the loosest pair in the grid (longest
+temporal window, lowest similarity) and cached in data/cache/edges_{mode}.npz;
+phylogeny.py reuses that cache too whenever it covers the module thresholds.
+Each grid point then filters the cached set, rebuilds the MST forest and reports
+tree statistics. Species are per cluster and time range, so they don't change
+with the thresholds and are not recomputed.
+
+    uv run python sweep_thresholds.py --mode image --temporal-days 7 30 90 --similarity 0.8 0.85 0.9
+"""
+import argparse
+import time
+import numpy as np
+from scipy.sparse.csgraph import minimum_spanning_tree
+from phylogeny import (GRAPH_WORKERS, KNN_LIMIT, candidate_edges, edge_distances, edge_graph, edges_digest,
+                       filter_edges, load_candidate_edges, load_clustered_data, load_item_embeddings,
+                       save_candidate_edges, spanning_forest)
+from neighbors import load_knn_graph
+
+DAY = 24 * 60 * 60
+
+
+def node_depths(parent: np.ndarray) -> np.ndarray:
+    """Depth of every node below its root, by pointer jumping (O(n log depth))."""
+    depth = (parent >= 0).astype(np.int64)
+    up = parent.copy()
+    while True:
+        has = np.flatnonzero(up >= 0)
+        if not len(has):
+            return depth
+        depth[has] += depth[up[has]]
+        up[has] = up[up[has]]
+
+
+def tree_stats(parent: np.ndarray) -> dict:
+    depth = node_depths(parent)
+    children = np.bincount(parent[parent >= 0], minlength=len(parent))
+    internal = children[children > 0]
+    return {
+        "components": int((parent < 0).sum()),
+        "max_depth": int(depth.max()),
+        "mean_depth": float(depth.mean()),
+        "mean_branching": float(internal.mean()) if len(internal) else 0.0,
+        "max_branching": int(children.max()),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep phylogeny temporal/similarity thresholds")
+    parser.add_argument("--mode", choices=["image", "text"], help="Embedding mode (default: the clustered file's)")
+    parser.add_argument("--temporal-days", type=float, nargs="+", default=[7, 14, 30, 60, 90])
+    parser.add_argument("--similarity", type=float, nargs="+", default=[0.75, 0.8, 0.85, 0.9, 0.95])
+    parser.add_argument("--rebuild-edges", action="store_true", help="Recompute the cached candidate edges")
+    args = parser.parse_args()
+
+    data = load_clustered_data(args.mode)
+    mode = data.get("mode", "image")
+    embeddings = load_item_embeddings(data["items"], mode)
+    timestamps = np.array([item["timestamp"] for item in data["items"]], dtype=np.int64)
+    n = len(timestamps)
+
+    loosest = (max(args.temporal_days) * DAY, min(args.similarity))
+    digest = edges_digest(embeddings, timestamps)
+    edges = None if args.rebuild_edges else load_candidate_edges(mode, digest, loosest)
+    if edges is None:
+        print(f"Computing candidate edges at {max(args.temporal_days):g} days / similarity {loosest[1]:g}...")
+        start = time.perf_counter()
+        graph = load_knn_graph(embeddings, mode) if n > KNN_LIMIT else None
+        edges = candidate_edges(embeddings, timestamps, graph, workers=GRAPH_WORKERS, thresholds=loosest)
+        save_candidate_edges(mode, edges, loosest, digest)
+        print(f"  {time.perf_counter() - start:.1f}s")
+
+    print(f"{'days':>6} {'sim':>5} {'edges':>10} {'comps':>6} {'depth':>6} {'mean d':>7} "
+          f"{'branch':>7} {'max br':>7} {'time s':>7}")
+    for days in sorted(args.temporal_days):
+        for similarity in sorted(args.similarity):
+            start = time.perf_counter()
+            thresholds = (days * DAY, similarity)
+            rows, cols, sims, time_diff = filter_edges(edges, thresholds)
+            mst = minimum_spanning_tree(edge_graph(rows, cols, edge_distances(sims, time_diff, thresholds[0]), n))
+            parent, _ = spanning_forest(mst, timestamps)
+            stats = tree_stats(parent)
+            elapsed = time.perf_counter() - start
+            print(f"{days:>6g} {similarity:>5g} {len(rows):>10} {stats['components']:>6} {stats['max_depth']:>6} "
+                  f"{stats['mean_depth']:>7.1f} {stats['mean_branching']:>7.2f} {stats['max_branching']:>7} "
+                  f"{elapsed:>7.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Columnar item table shared by the cluster and phylogeny stages.
+
+Items arrive as JSON dicts, but are held as one NumPy column per field: int64
+timestamps, int32 cluster ids, an (N, 2) UMAP array, and object columns
+for strings/lists. Fields only some items carry (duplicates, chunk_offset, ...) keep
+a presence mask. Per-cluster work goes through group_rows() (one stable argsort),
+and dicts are rebuilt only by to_items() when JSON is written.
+"""
+import numpy as np
+
+INT_DTYPES = {"timestamp": np.int64, "cluster": np.int32, "chunk_offset": np.int64, "chunk_count": np.int64}
+VECTOR_FIELDS = {"umap"}
+
+
+def _column(name: str, values: list) -> np.ndarray:
+    if name in INT_DTYPES:
+        return np.asarray(values, dtype=INT_DTYPES[name])
+    if name in VECTOR_FIELDS:
+        return np.asarray(values, dtype=np.float64)
+    column = np.empty(len(values), dtype=object)
+    column[:] = values
+    return column
+
+
+class ItemTable:
+    """Columns keyed by item field name; the row order is the embedding-matrix row order."""
+
+    def __init__(self, columns: dict[str, np.ndarray], present: dict[str, np.ndarray] = None):
+        self.columns = columns
+        self.present = present or {}  # field -> bool mask, only for fields missing on some rows
+
+    @classmethod
+    def from_items(cls, items: list[dict]) -> "ItemTable":
+        fields = list(dict.fromkeys(k for item in items for k in item))
+        columns, present = {}, {}
+        for name in fields:
+            mask = np.fromiter((name in item for item in items), dtype=bool, count=len(items))
+            if mask.all():
+                columns[name] = _column(name, [item[name] for item in items])
+            else:
+                values = np.empty(len(items), dtype=object)
+                values[:] = [item.get(name) for item in items]
+                columns[name] = values
+                present[name] = mask
+        return cls(columns, present)
+
+    def __len__(self) -> int:
+        return len(next(iter(self.columns.values()))) if self.columns else 0
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.columns[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.columns
+
+    def get(self, name: str, default=None) -> np.ndarray:
+        return self.columns.get(name, default)
+
+    def set_column(self, name: str, values):
+        """Add or replace a full column."""
+        self.columns[name] = _column(name, values) if not isinstance(values, np.ndarray) else values
+        self.present.pop(name, None)
+
+    def group_rows(self, labels: np.ndarray = None) -> tuple[np.ndarray, list[np.ndarray]]:
+        """
+        (group ids, row indices per group) for labels >= 0 (default: the cluster column).
+        One stable argsort, so rows inside each group stay in table order.
+        """
+        labels = self.columns["cluster"] if labels is None else labels
+        rows = np.flatnonzero(labels >= 0)
+        rows = rows[np.argsort(labels[rows], kind="stable")]
+        ids, starts = np.unique(labels[rows], return_index=True)
+        return ids, np.split(rows, starts[1:])
+
+    def to_items(self, exclude: set[str] = frozenset()) -> list[dict]:
+        """Materialize JSON-ready dicts (field order preserved, absent sparse fields omitted)."""
+        names = [n for n in self.columns if n not in exclude]
+        lists = [self.columns[n].tolist() for n in names]
+        masks = [self.present.get(n) for n in names]
+        items = []
+        for i in range(len(self)):
+            items.append({n: col[i] for n, col, mask in zip(names, lists, masks) if mask is None or mask[i]})
+        return items
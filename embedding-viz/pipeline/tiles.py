@@ -0,0 +1,96 @@
+"""
+Quadtree level-of-detail tiles for the map.
+
+The padded UMAP extent is split recursively into quadrants. A tile holding at most
+TILE_CAPACITY items (or at MAX_ZOOM) is a leaf and stores its items. Coarser tiles
+store per-cluster aggregates plus a representative sample, so the frontend can draw
+the overview from the root tile and fetch finer tiles only for the area in view.
+Samples come from one global random ranking, so a point sampled at a coarse level
+is also in every finer tile that covers it.
+
+Layout under frontend/public/data/tiles_{mode}/:
+    index.json   extent, bounds, clusters, {"z/x/y": [count, is_leaf]}
+    z/x/y.json   {"leaf", "count", "clusters", "items"}
+Every file is written through output.write_json with .gz/.br siblings.
+"""
+import shutil
+from pathlib import Path
+import numpy as np
+from density import padded_extent
+from output import write_json
+
+TILE_CAPACITY = 256
+MAX_ZOOM = 10
+SAMPLE_SIZE = 64  # representative items per inner tile
+
+
+def cluster_aggregates(coords: np.ndarray, labels: np.ndarray) -> list[dict]:
+    """[{id, count, centroid}] for the non-noise rows of one tile."""
+    valid = labels >= 0
+    ids, group = np.unique(labels[valid], return_inverse=True)
+    counts = np.bincount(group, minlength=len(ids))
+    sums = np.stack([np.bincount(group, weights=coords[valid, d], minlength=len(ids)) for d in range(2)], axis=1)
+    return [{"id": int(c), "count": int(n), "centroid": (s / n).tolist()} for c, n, s in zip(ids, counts, sums)]
+
+
+def build_tiles(coords: np.ndarray, capacity: int = TILE_CAPACITY,
+                max_zoom: int = MAX_ZOOM) -> tuple[tuple, dict]:
+    """Returns (padded extent, {(z, x, y): (all row indices under the tile, is_leaf)}); tile y grows with UMAP y."""
+    coords = np.asarray(coords, dtype=np.float64)
+    extent = padded_extent(coords)
+    x0, y0, x1, y1 = extent
+    u = np.clip((coords[:, 0] - x0) / (x1 - x0), 0, np.nextafter(1, 0))
+    v = np.clip((coords[:, 1] - y0) / (y1 - y0), 0, np.nextafter(1, 0))
+
+    tiles = {}
+    stack = [(0, 0, 0, np.arange(len(coords)))]
+    while stack:
+        z, x, y, rows = stack.pop()
+        leaf = len(rows) <= capacity or z == max_zoom
+        tiles[(z, x, y)] = (rows, leaf)
+        if leaf:
+            continue
+        scale = 2 ** (z + 1)
+        cx = (u[rows] * scale).astype(np.int64) - 2 * x
+        cy = (v[rows] * scale).astype(np.int64) - 2 * y
+        for qy in (0, 1):
+            for qx in (0, 1):
+                child = rows[(cx == qx) & (cy == qy)]
+                if len(child):
+                    stack.append((z + 1, 2 * x + qx, 2 * y + qy, child))
+    return extent, tiles
+
+
+def write_tiles(out_dir: Path, coords: np.ndarray, labels: np.ndarray, items: list[dict], clusters: list[dict],
+                capacity: int = TILE_CAPACITY, sample_size: int = SAMPLE_SIZE) -> dict:
+    """Write the pyramid (replacing any previous one) and return the index."""
+    extent, tiles = build_tiles(coords, capacity)
+    rank = np.random.default_rng(42).permutation(len(items))
+    if out_dir.exists():
+        shutil.rmtree(out_dir)
+
+    index_tiles = {}
+    for (z, x, y), (rows, leaf) in tiles.items():
+        payload = {"leaf": leaf, "count": len(rows)}
+        if leaf:
+            payload["items"] = [items[i] for i in rows.tolist()]
+        else:
+            sample = rows[np.argsort(rank[rows], kind="stable")[:sample_size]]
+            payload["clusters"] = cluster_aggregates(coords[rows], labels[rows])
+            payload["items"] = [items[i] for i in sample.tolist()]
+        write_json(payload, [out_dir / str(z) / str(x) / f"{y}.json"], compress=True)
+        index_tiles[f"{z}/{x}/{y}"] = [len(rows), leaf]
+
+    lo, hi = coords.min(axis=0), coords.max(axis=0)
+    index = {
+        "extent": list(extent),
+        "bounds": [float(lo[0]), float(lo[1]), float(hi[0]), float(hi[1])],
+        "count": len(items),
+        "capacity": capacity,
+        "max_zoom": max(z for z, _, _ in tiles),
+        "clusters": clusters,
+        "tiles": index_tiles,
+    }
+    write_json(index, [out_dir / "index.json"], compress=True)
+    print(f"Wrote {len(tiles)} tiles ({sum(leaf for _, leaf in tiles.values())} leaves) to {out_dir}")
+    return index
@@ -13,6 +13,7 @@ from PIL import Image
 from sentence_transformers import SentenceTransformer
 
 IMAGE_EXTS = {".jpg", ".jpeg", ".png", ".webp", ".bmp", ".tiff"}
+DRAFT_SIZE = 448  # decode JPEGs no smaller than this (2x the CLIP input)
 
 
 def list_images(root: str) -> List[str]:
@@ -97,7 +98,10 @@ class ImageBucketer:
 
         for i, path in enumerate(image_paths, 1):
             try:
-                img = Image.open(path).convert("RGB")
+                img = Image.open(path)
+                # JPEG: decode at reduced scale; CLIP only needs ~224px.
+                img.draft("RGB", (DRAFT_SIZE, DRAFT_SIZE))
+                img = img.convert("RGB")
             except Exception as e:
                 print(f"Failed to open {path}: {e}", file=sys.stderr)
                 continue